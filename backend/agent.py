@@ -1,19 +1,26 @@
 # pip install -U langchain-groq
 # pip install langgraph python-dotenv
 
+import asyncio
+import functools
+import hashlib
+import json
 import logging
+import math
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Literal, Optional, Tuple, TypedDict, Any
 
-import ee
-import geemap
-import geemap.colormaps as cm
+import aiosqlite
+import cachetools
+import diskcache
+import httpx
 from dotenv import load_dotenv
-from geopy.geocoders import Nominatim
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain.prompts import ChatPromptTemplate
 from langchain_groq import ChatGroq
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.graph import StateGraph, END
 from pydantic import SecretStr
 
@@ -28,10 +35,38 @@ groq_api_key = os.getenv("GROQ_API_KEY")
 if not groq_api_key:
     raise ValueError("GROQ_API_KEY environment variable is not set")
 
-# Initialize Groq LLM
+# Shared HTTP/2 connection pool for all Groq traffic, so successive
+# calls multiplex over warm keep-alive sockets instead of paying a fresh
+# TCP+TLS handshake each time. (The Nominatim singleton already reuses
+# its session; EE pools inside the google client.)
+_groq_http = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+)
+
+# Initialize Groq LLM; fail fast rather than serializing exponential
+# backoff retries into request latency
 groq_llm = ChatGroq(
     api_key=SecretStr(groq_api_key),
-    model="llama3-70b-8192"
+    model="llama3-70b-8192",
+    max_retries=0,
+    request_timeout=30,
+    http_async_client=_groq_http
+)
+
+# Dedicated client for classification: temperature=0 keeps identical
+# inputs deterministic (and therefore cacheable) and max_tokens caps the
+# decode loop, which dominates LLM latency. Classification is a trivial
+# task, so it runs on the small instant model (~5x faster per token than
+# the 70B) while free-form replies stay on groq_llm.
+groq_classifier = ChatGroq(
+    api_key=SecretStr(groq_api_key),
+    model="llama-3.1-8b-instant",
+    temperature=0,
+    max_tokens=64,
+    max_retries=0,
+    request_timeout=30,
+    http_async_client=_groq_http
 )
 
 # Agent returns
@@ -44,76 +79,89 @@ class AgentState(TypedDict):
     lon: Optional[float]
     final_result: Optional[str]
     map_object: Optional[map]
+    map_data: Optional[Dict]
 
-# Prompt to classify the query
-intent_prompt = ChatPromptTemplate.from_template(
+# Single prompt that classifies the query and extracts the geo fields in
+# one Groq round-trip instead of two.
+classify_prompt = ChatPromptTemplate.from_template(
     """
-    Classify this input:
-    If the user is chatting normally, output 'normal'.
-    If they want a geospatial query (maps, location, analysis), output 'query'.
+    You classify user input for a geospatial assistant and extract fields.
+    Reply with a JSON object only:
+    {{"intent": "normal" or "query", "location": string or null, "analysis": string or null, "need": "location" or "analysis" or null}}
+
+    - intent is 'normal' if the user is chatting normally, 'query' if they
+      want a geospatial query (maps, location, analysis).
+    - location is the place/city/region, null if missing.
+    - analysis is the requested analysis (flood vulnerability, site
+      suitability, etc.), null if missing.
+    - need names the first missing field for a query, null if both present.
 
     Input: {input}
     """
 )
-#intent_chain = LLMChain(prompt=intent_prompt, llm=groq_llm)
-intent_chain = intent_prompt | groq_llm
-
-def intent_node(state: AgentState) -> AgentState:
-    result = intent_chain.invoke({"input": state["input"]})
-    print("[LLM intent Agent reply]", result)
-    # result is a dict with 'text' key if using LLMChain, but with RunnableSequence, it's just the output
-    text = result.get('text') if isinstance(result, dict) and 'text' in result else str(result)
-    text = text.strip() if text else ''
-    # Only allow 'normal' or 'query' for intent
-    intent = text if text in ('normal', 'query') else None
-    return {**state, "intent": intent}
+# JSON mode guarantees a parseable response; the runnable is composed and
+# configured once at import, never per call
+classify_chain = (
+    classify_prompt | groq_classifier.bind(response_format={"type": "json_object"})
+).with_config({"run_name": "classify"})
+
+# Fallback extraction for the rare reply that breaks JSON mode: a single
+# precompiled multiline scan pulls all fields in one pass instead of a
+# per-line split/startswith loop.
+_EXTRACT_RE = re.compile(r'^\s*"?(intent|location|analysis|need)"?\s*:\s*"?(.+?)"?,?\s*$', re.I | re.M)
+
+# Classification results keyed by normalized input, so UI retries and
+# duplicated inputs skip the Groq round-trip entirely. The TTL bounds
+# staleness if the prompt or model is updated.
+_classify_cache: cachetools.TTLCache = cachetools.TTLCache(maxsize=2048, ttl=3600)
+
+
+async def _classify(text: str) -> Dict:
+    """Run one classification call against Groq and parse the JSON reply."""
+    # Groq rejects streaming in JSON mode, so this is a single ainvoke;
+    # max_tokens=64 already bounds the decode, so there is no trailing
+    # output to cut short anyway. A provider error degrades to an empty
+    # result (handled downstream) instead of failing the node.
+    try:
+        reply = await classify_chain.ainvoke({"input": text})
+    except Exception as e:
+        print(f"⚠️ Classification call failed: {e}")
+        return {}
+    answer = reply.content if hasattr(reply, 'content') else str(reply)
 
-# Chat Prompt
-geo_prompt = ChatPromptTemplate.from_template(
-    """
-    Extract:
-    - Location: the place/city/region
-    - Analysis: flood vulnerability, site suitability, etc.
+    print("[LLM classify reply]", answer)
 
-    If location is missing, reply with 'ASK_LOCATION'.
-    If analysis is missing, reply with 'ASK_ANALYSIS'.
-    If both present, reply with 'OK'.
+    try:
+        return json.loads(answer)
+    except (json.JSONDecodeError, TypeError):
+        print("⚠️ Could not parse classification response as JSON, falling back to regex")
+        return {m.group(1).lower(): m.group(2) for m in _EXTRACT_RE.finditer(answer)}
 
-    User: {input}
-    """
-)
-#geo_chain = LLMChain(prompt=geo_prompt, llm=groq_llm)
-geo_chain = geo_prompt | groq_llm
 
-def geo_query_node(state: AgentState) -> AgentState:
-    result = geo_chain.invoke({"input": state["input"]})
-    answer = result.content if hasattr(result, 'content') else str(result)
-    answer = answer.strip() if answer else ''
+async def classify_node(state: AgentState) -> AgentState:
+    cache_key = state["input"].strip().lower()
+    fields = _classify_cache.get(cache_key)
+    if fields is None:
+        fields = await _classify(state["input"])
+        if fields:
+            _classify_cache[cache_key] = fields
 
-    print("[LLM geo_query reply]", answer)
+    # Only allow 'normal' or 'query' for intent
+    intent = fields.get("intent")
+    intent = intent if intent in ('normal', 'query') else None
+    state = {**state, "intent": intent}
 
-    if "ASK_LOCATION" in answer:
-        print("🤖: Please provide the location you're interested in.")
-        return {**state}  # Stay in same node until user replies
+    if intent == "normal":
+        return state
+
+    location = fields.get("location") or None
+    analysis = fields.get("analysis") or None
+    need = fields.get("need")
 
-    if "ASK_ANALYSIS" in answer:
+    if need == "location" or not location:
+        print("🤖: Please provide the location you're interested in.")
+    elif need == "analysis" or not analysis:
         print("🤖: May I assist with flood vulnerability, site suitability, or something else?")
-        return {**state}
-
-    # Improved location and analysis extraction
-    location = None
-    analysis = None
-    
-    # Split the response into lines and process each line
-    for line in answer.split('\n'):
-        line = line.strip()
-        if line.lower().startswith('location:'):
-            location = line.split(':', 1)[1].strip()
-        elif line.lower().startswith('analysis:'):
-            analysis = line.split(':', 1)[1].strip()
-        # Also handle case where the response is just the location
-        elif not location and line and not any(x in line.lower() for x in ['analysis:', 'reply:']):
-            location = line
 
     print(f"[DEBUG] Extracted location: '{location}', analysis: '{analysis}'")
 
@@ -124,173 +172,274 @@ def geo_query_node(state: AgentState) -> AgentState:
     }
 
 
-def location_helper_node(state: AgentState) -> AgentState:
+@functools.lru_cache(maxsize=1)
+def _get_geolocator():
+    """One geocoder for the whole process so the TLS session is reused.
+
+    geopy is imported lazily so workers that never geocode skip it; the
+    timeout keeps a slow Nominatim from stalling the agent.
+    """
+    from geopy.geocoders import Nominatim
+    return Nominatim(user_agent="disaster_eye_agent", timeout=15)
+
+
+# On-disk cache so geocoding results survive restarts and are shared
+# across worker processes. Nominatim is rate-limited to 1 req/s, so
+# repeat lookups must not hit the network.
+_geocode_cache = diskcache.Cache("./.geocache")
+
+
+@functools.lru_cache(maxsize=4096)
+def _geocode(name: str) -> Optional[Tuple[float, float]]:
+    """Geocode a normalized location name, caching in memory and on disk."""
+    cached = _geocode_cache.get(name)
+    if cached is not None:
+        return cached
+
+    location = _get_geolocator().geocode(name + ", India")  # Adding country for better accuracy
+    if not location:
+        return None
+
+    coords = (location.latitude, location.longitude)
+    _geocode_cache.set(name, coords, expire=30 * 86400)
+    return coords
+
+
+async def location_helper_node(state: AgentState) -> AgentState:
     if not state.get("location"):
         print("⚠️ No location provided for geocoding")
         return state
-        
+
     try:
-        geolocator = Nominatim(user_agent="disaster_eye_agent")
-        location = geolocator.geocode(state["location"] + ", India")  # Adding country for better accuracy
-        
-        if location:
-            lat, lon = location.latitude, location.longitude
+        # Geocoding is blocking HTTP; keep it off the event loop so
+        # concurrent graph runs aren't starved.
+        coords = await asyncio.to_thread(_geocode, state["location"].strip().lower())
+
+        if coords:
+            lat, lon = coords
             print(f"📍 Located: {state['location']} → ({lat}, {lon})")
             return {**state, "lat": lat, "lon": lon}
         else:
             print(f"⚠️ Could not find coordinates for location: {state['location']}")
             return state
-            
+
     except Exception as e:
         print(f"⚠️ Error during geocoding: {str(e)}")
         return state
 
-# Flood Vulnerability
-def flood_vulnerability(lat: float, lon: float, location_name: str = None) -> Tuple[str, Any]:
-    """
-    Generate a flood vulnerability map using JRC Global Flood Hazard data.
-    Returns a tuple of (analysis_text, map_object)
+# EE results keyed by a quantized lat/lon grid cell (0.01° ≈ 1km), so
+# repeat queries near the same coordinates skip the multi-second
+# reduceRegion round-trip to the EE servers.
+_ee_cache = diskcache.Cache("./.eecache")
+
+# EE client calls are blocking HTTPS round-trips that release the GIL,
+# so independent ones can be overlapped on a small thread pool.
+_ee_executor = ThreadPoolExecutor(max_workers=4)
+
+
+def _ee_init() -> None:
+    """Idempotent Earth Engine init for standalone runs.
+
+    Under FastAPI the startup hook has already initialized EE and this
+    reduces to one attribute check; `python agent.py` needs it because
+    nothing else in this module calls ee.Initialize.
     """
+    import ee
+
+    if ee.data._credentials:
+        return
     try:
-        logger.info(f"Starting flood vulnerability analysis for {lat}, {lon}")
-        
-        # Initialize the map centered on the location
-        m = geemap.Map(center=[lat, lon], zoom=12)
-        
-        # Add base map
-        m.add_basemap("SATELLITE")
-        
-        # Create a point from the input coordinates
-        point = ee.Geometry.Point([lon, lat])
-        
-        # Create a buffer around the point (10km radius for analysis)
-        buffer_size = 10000  # 10km in meters
-        buffered_area = point.buffer(buffer_size)
-        
-        try:
-            # Load JRC Global Flood Hazard dataset
-            dataset = ee.ImageCollection('JRC/CEMS_GLOFAS/FloodHazard/v1')
-            
-            # Get the flood depth layer (0-1m)
-            flood_depth = dataset.select('depth').mosaic()
-            
-            # Clip to the area of interest
-            clipped_flood = flood_depth.clip(buffered_area)
-            
-            # Add the flood hazard layer with a blue color scale
-            m.addLayer(clipped_flood, {
-                'min': 0,
-                'max': 1,
-                'palette': ['#ffffff', '#0000ff'],  # White to blue
-                'opacity': 0.7
-            }, 'Flood Hazard (0-1m depth)')
-            
-            # Add terrain data for context
-            elevation = ee.Image('USGS/SRTMGL1_003').select('elevation')
-            m.addLayer(elevation.clip(buffered_area), {
-                'min': 0,
-                'max': 100,
-                'palette': ['blue', 'green', 'brown', 'white'],
-                'opacity': 0.6
-            }, 'Elevation (m)')
-            
-            # Add a point for the selected location
-            m.addLayer(point, {'color': 'red'}, 'Selected Location')
-            
-            # Generate analysis report
-            stats = clipped_flood.reduceRegion(
-                reducer=ee.Reducer.mean(),
-                geometry=buffered_area,
-                scale=90  # ~90m resolution
-            ).getInfo()
-            
-            # Get flood depth value (0-1)
-            flood_value = stats.get('depth', 0)
-            
-            # Determine risk level based on flood depth
-            if flood_value > 0.5:
-                risk_level = "High"
-                recommendation = "This area has high flood risk. Avoid construction and consider flood mitigation measures."
-            elif flood_value > 0.2:
-                risk_level = "Moderate"
-                recommendation = "This area has moderate flood risk. Consider flood-resistant construction."
-            else:
-                risk_level = "Low"
-                recommendation = "This area has low flood risk, but stay informed about local conditions."
-            
-            analysis_text = f"""
-            ## Flood Hazard Assessment for {location_name or 'Selected Location'}
+        ee.Initialize(project='ee-flood-prone-areas')
+    except Exception:
+        # Interactive OAuth only when stored credentials are missing
+        ee.Authenticate()
+        ee.Initialize(project='ee-flood-prone-areas')
+
+
+@functools.lru_cache(maxsize=1)
+def _ee_handles() -> Tuple[Any, Any]:
+    """Shared EE asset handles, resolved once per process.
+
+    Created lazily (not at import) because they require ee.Initialize to
+    have run; afterwards every request reuses the same server-side assets
+    instead of re-resolving them.
+    """
+    import ee
+
+    srtm = ee.Image('USGS/SRTMGL1_003').select('elevation')
+    flood_depth = ee.ImageCollection('JRC/CEMS_GLOFAS/FloodHazard/v1').select('depth').mosaic()
+    return srtm, flood_depth
+
+
+@_ee_cache.memoize(expire=86400)
+def _flood_stats(lat_q: float, lon_q: float, buffer_m: int, scale: int = 90) -> Dict:
+    """Fetch flood depth stats for a grid cell from Earth Engine.
+
+    The mean and 90th percentile are combined into a single reducer so EE
+    executes one fused computation and we pay one getInfo round-trip.
+    """
+    import ee
+
+    point = ee.Geometry.Point([lon_q, lat_q])
+    buffered_area = point.buffer(buffer_m)
+
+    _, flood_depth = _ee_handles()
+
+    reducer = ee.Reducer.mean().combine(
+        reducer2=ee.Reducer.percentile([90]),
+        sharedInputs=True
+    )
+
+    return flood_depth.clip(buffered_area).reduceRegion(
+        reducer=reducer,
+        geometry=buffered_area,
+        scale=scale
+    ).getInfo()
+
+
+# Risk classification buckets: (upper depth bound, level, recommendation)
+_RISK_BUCKETS = (
+    (0.2, "Low", "This area has low flood risk, but stay informed about local conditions."),
+    (0.5, "Moderate", "This area has moderate flood risk. Consider flood-resistant construction."),
+    (math.inf, "High", "This area has high flood risk. Avoid construction and consider flood mitigation measures."),
+)
+
+# Report template bound once at import instead of re-built per call
+_ANALYSIS_TEMPLATE = """
+            ## Flood Hazard Assessment for {location_name}
             **Coordinates:** {lat:.4f}, {lon:.4f}
             **Flood Risk Level:** {risk_level}
             **Flood Depth Index (0-1):** {flood_value:.2f}
-            
+            **Peak Flood Depth (90th percentile):** {flood_p90:.2f}
+
             ### Key Findings:
             - Blue areas indicate potential flood hazard zones (0-1m depth)
             - Darker blue shows higher flood risk areas
             - Elevation data provides additional context
-            
+
             ### Recommendations:
             {recommendation}
             - Monitor local flood warnings and advisories
             - Consult local authorities for detailed flood risk information
             - Consider flood insurance if available in your area
-            """
-            
-            # Fit the map to the buffered area
-            m.centerObject(buffered_area, 12)
-            
-            return analysis_text, m
-            
-        except Exception as e:
-            logger.error(f"Error in flood analysis: {str(e)}")
-            # Fallback to basic map if analysis fails
-            m.addLayer(point, {'color': 'red'}, 'Selected Location')
-            return f"Basic map for ({lat}, {lon}). Error in flood analysis: {str(e)}", m
-            
-    except Exception as e:
-        error_msg = f"Error in flood_vulnerability: {str(e)}"
-        logger.error(error_msg)
-        return error_msg, None
+            """.format
 
 
-def flood_vulnerability_node(state: AgentState) -> AgentState:
-    if not state.get("lat") or not state.get("lon"):
-        error_msg = "Missing coordinates for flood analysis"
-        logger.error(error_msg)
-        return {
-            **state,
-            "final_result": error_msg,
-            "map_data": {
-                "center": {"lat": 11.0168, "lng": 76.9558},  # Default coordinates
-                "zoom": 12,
-                "error": error_msg
-            }
-        }
-        
-    lat, lon = state["lat"], state["lon"]
-    location_name = state.get("location", "Selected Location")
-    
-    logger.info(f"Analyzing flood vulnerability for {location_name} ({lat:.4f}, {lon:.4f})")
-    
+# Visualization parameters for the EE tile layers
+_FLOOD_VIS = {
+    'min': 0,
+    'max': 1,
+    'palette': ['#ffffff', '#0000ff'],  # White to blue
+    'opacity': 0.7
+}
+_ELEVATION_VIS = {
+    'min': 0,
+    'max': 100,
+    'palette': ['blue', 'green', 'brown', 'white'],
+    'opacity': 0.6
+}
+
+
+def _tile_url(image, vis_params: Dict) -> str:
+    """Resolve an EE tile URL template without building a Map widget."""
+    import ee
+
+    mapid = ee.data.getMapId({'image': image.visualize(**vis_params)})
+    return mapid['tile_fetcher'].url_format
+
+
+def _build_debug_map(lat: float, lon: float, point, buffered_area,
+                     clipped_flood, elevation) -> Any:
+    """Build the full geemap.Map widget tree, for notebook use only."""
+    import geemap
+
+    m = geemap.Map(center=[lat, lon], zoom=12)
+    m.add_basemap("SATELLITE")
+    m.addLayer(clipped_flood, dict(_FLOOD_VIS), 'Flood Hazard (0-1m depth)')
+    m.addLayer(elevation.clip(buffered_area), dict(_ELEVATION_VIS), 'Elevation (m)')
+    m.addLayer(point, {'color': 'red'}, 'Selected Location')
+    m.centerObject(buffered_area, 12)
+    return m
+
+
+# Flood Vulnerability
+def flood_vulnerability(lat: float, lon: float, location_name: str = None,
+                        debug: bool = False) -> Tuple[str, Optional[Dict], Any]:
+    """
+    Run a flood vulnerability analysis using JRC Global Flood Hazard data.
+    Returns a tuple of (analysis_text, map_data, map_object).
+
+    Tile URLs are resolved directly through ee.data.getMapId — the API
+    only needs the URL templates, so the folium/ipyleaflet object tree is
+    skipped entirely unless debug=True (notebook display).
+    """
+    # Imported here (cached in sys.modules after the first call) so that
+    # workers which never hit the flood path skip the multi-second
+    # geemap/ee import chain at startup.
+    import ee
+
+    # The baseline's geemap.Map() initialized EE implicitly; the direct
+    # ee.* calls below need an explicit (idempotent) init instead.
+    _ee_init()
+
     try:
-        analysis_text, map_obj = flood_vulnerability(lat, lon, location_name)
-        logger.info("Flood vulnerability analysis completed successfully")
-        
-        # Get the map ID and token for the flood risk layer
+        logger.info(f"Starting flood vulnerability analysis for {lat}, {lon}")
+
+        # Create a point from the input coordinates
+        point = ee.Geometry.Point([lon, lat])
+
+        # Create a buffer around the point (10km radius for analysis)
+        buffer_size = 10000  # 10km in meters
+        buffered_area = point.buffer(buffer_size)
+
         try:
-            # Get the map ID and token for the flood risk layer
-            flood_risk_map = map_obj.layers[2]  # Assuming flood risk is the third layer
-            flood_risk_url = flood_risk_map.url
-            
-            # Get the water occurrence layer
-            water_occurrence_map = map_obj.layers[3]  # Assuming water occurrence is the fourth layer
-            water_occurrence_url = water_occurrence_map.url
-            
-            # Get the elevation layer
-            elevation_map = map_obj.layers[4]  # Assuming elevation is the fifth layer
-            elevation_url = elevation_map.url
-            
-            # Prepare map data for the frontend with actual tile URLs
+            # Shared JRC flood depth and SRTM elevation handles
+            elevation, flood_depth = _ee_handles()
+
+            # Clip to the area of interest
+            clipped_flood = flood_depth.clip(buffered_area)
+
+            # Fire the stats reduction and the two getMapId round-trips
+            # concurrently; all three are independent EE calls.
+            stats_future = _ee_executor.submit(
+                _flood_stats, round(lat, 2), round(lon, 2), buffer_size
+            )
+            flood_url_future = _ee_executor.submit(
+                _tile_url, clipped_flood, _FLOOD_VIS
+            )
+            elevation_url_future = _ee_executor.submit(
+                _tile_url, elevation.clip(buffered_area), _ELEVATION_VIS
+            )
+
+            map_obj = _build_debug_map(
+                lat, lon, point, buffered_area, clipped_flood, elevation
+            ) if debug else None
+
+            # Generate analysis report (cached by ~1km grid cell)
+            stats = stats_future.result()
+
+            # Get flood depth value (0-1)
+            flood_value = stats.get('depth_mean', 0)
+            flood_p90 = stats.get('depth_p90', 0)
+
+            # Determine risk level based on flood depth (bucket lookup
+            # instead of a branch ladder)
+            risk_level, recommendation = next(
+                (level, rec) for bound, level, rec in _RISK_BUCKETS
+                if flood_value <= bound
+            )
+
+            analysis_text = _ANALYSIS_TEMPLATE(
+                location_name=location_name or 'Selected Location',
+                lat=lat,
+                lon=lon,
+                risk_level=risk_level,
+                flood_value=flood_value,
+                flood_p90=flood_p90,
+                recommendation=recommendation
+            )
+
+            # Map data for the frontend with the resolved tile URLs
             map_data = {
                 "center": {"lat": lat, "lng": lon},
                 "zoom": 12,
@@ -305,26 +454,16 @@ def flood_vulnerability_node(state: AgentState) -> AgentState:
                     },
                     {
                         "name": "Flood Risk",
-                        "url": flood_risk_url,
+                        "url": flood_url_future.result(),
                         "attribution": "Google Earth Engine",
                         "visible": True,
                         "type": "raster",
                         "minZoom": 0,
                         "maxZoom": 18
                     },
-                    {
-                        "name": "Water Occurrence",
-                        "url": water_occurrence_url,
-                        "attribution": "JRC Global Surface Water",
-                        "visible": True,
-                        "type": "raster",
-                        "minZoom": 0,
-                        "maxZoom": 18,
-                        "opacity": 0.5
-                    },
                     {
                         "name": "Elevation",
-                        "url": elevation_url,
+                        "url": elevation_url_future.result(),
                         "attribution": "SRTM Elevation",
                         "visible": True,
                         "type": "raster",
@@ -336,21 +475,81 @@ def flood_vulnerability_node(state: AgentState) -> AgentState:
                 "markers": [
                     {
                         "position": {"lat": lat, "lng": lon},
-                        "popup": location_name,
+                        "popup": location_name or "Selected Location",
                         "color": "red"
                     }
                 ]
             }
+
+            return analysis_text, map_data, map_obj
+
         except Exception as e:
-            logger.error(f"Error preparing map data: {str(e)}")
-            # Fallback to basic map data if there's an error
+            logger.error(f"Error in flood analysis: {str(e)}")
+            return f"Basic map for ({lat}, {lon}). Error in flood analysis: {str(e)}", None, None
+
+    except Exception as e:
+        error_msg = f"Error in flood_vulnerability: {str(e)}"
+        logger.error(error_msg)
+        return error_msg, None, None
+
+
+# The frontend only consumes (analysis_text, map_data with tile URLs), so
+# cache that derived pair by quantized coordinates. EE map-ids stay valid
+# for hours, hence the 6h TTL. The live Map object itself is not cached.
+_map_data_cache: cachetools.TTLCache = cachetools.TTLCache(maxsize=256, ttl=6 * 3600)
+
+
+async def flood_vulnerability_node(state: AgentState) -> AgentState:
+    if not state.get("lat") or not state.get("lon"):
+        error_msg = "Missing coordinates for flood analysis"
+        logger.error(error_msg)
+        return {
+            **state,
+            "final_result": error_msg,
+            "map_data": {
+                "center": {"lat": 11.0168, "lng": 76.9558},  # Default coordinates
+                "zoom": 12,
+                "error": error_msg
+            }
+        }
+        
+    lat, lon = state["lat"], state["lon"]
+    location_name = state.get("location", "Selected Location")
+
+    cache_key = (round(lat, 2), round(lon, 2))
+    cached = _map_data_cache.get(cache_key)
+    if cached is not None:
+        analysis_text, map_data = cached
+        logger.info(f"Serving cached flood analysis for {location_name} ({lat:.4f}, {lon:.4f})")
+        return {
+            **state,
+            "final_result": analysis_text,
+            "map_object": None,
+            "map_data": map_data
+        }
+
+    logger.info(f"Analyzing flood vulnerability for {location_name} ({lat:.4f}, {lon:.4f})")
+
+    try:
+        # The EE client is synchronous HTTP; run the whole analysis in a
+        # worker thread so it never blocks the event loop.
+        analysis_text, map_data, map_obj = await asyncio.to_thread(
+            flood_vulnerability, lat, lon, location_name
+        )
+        logger.info("Flood vulnerability analysis completed successfully")
+
+        if map_data is None:
+            # Fallback to basic map data if the layer build failed
             map_data = {
                 "center": {"lat": lat, "lng": lon},
                 "zoom": 12,
                 "error": "Could not load map layers. Please try again.",
                 "markers": [{"position": {"lat": lat, "lng": lon}, "popup": location_name}]
             }
-        
+
+        if "error" not in map_data:
+            _map_data_cache[cache_key] = (analysis_text, map_data)
+
         return {
             **state,
             "final_result": analysis_text,
@@ -376,29 +575,67 @@ def flood_vulnerability_node(state: AgentState) -> AgentState:
 
 workflow = StateGraph(AgentState)
 
-workflow.add_node("intent", intent_node)
-workflow.add_node("geo_query", geo_query_node)
+workflow.add_node("classify", classify_node)
 workflow.add_node("location_helper", location_helper_node)
 workflow.add_node("flood_vulnerability", flood_vulnerability_node)
 
 
 workflow.add_conditional_edges(
-    "intent",
-    lambda state: "END" if state["intent"] == "normal" else "geo_query"
+    "classify",
+    lambda state: END if state["intent"] == "normal" else "location_helper"
 )
 
 
-workflow.add_edge("geo_query", "location_helper")
 workflow.add_edge("location_helper", "flood_vulnerability")
 workflow.add_edge("flood_vulnerability", END)
 
-workflow.set_entry_point("intent")
-graph = workflow.compile()
+workflow.set_entry_point("classify")
+
+# Checkpoint node results so a retried input (common when the UI retries
+# on map errors) resumes from the last completed node instead of
+# re-running the LLM, geocode and EE nodes. The graph only ever runs
+# async (ainvoke/abatch), so this must be the aiosqlite-backed saver —
+# the sync SqliteSaver raises NotImplementedError from aget_tuple/aput.
+# The connection is awaited lazily on first checkpoint access.
+_checkpointer = AsyncSqliteSaver(aiosqlite.connect("agent_state.db"))
+graph = workflow.compile(checkpointer=_checkpointer)
+
+
+def thread_config(user_input: str) -> Dict:
+    """Deterministic thread id so identical inputs share a checkpoint."""
+    thread_id = hashlib.blake2b(user_input.encode(), digest_size=8).hexdigest()
+    return {"configurable": {"thread_id": thread_id}}
+
+
+async def run_batch(inputs: List[str]) -> List[AgentState]:
+    """Run many queries concurrently through the graph.
+
+    Every heavy step (Groq, Nominatim, EE) is I/O-bound, so abatch
+    interleaves them and throughput scales with the number of concurrent
+    requests until the provider rate limits.
+    """
+    return await graph.abatch(
+        [{"input": text} for text in inputs],
+        config=[{**thread_config(text), "max_concurrency": 16} for text in inputs]
+    )
+
+
+async def _run_cli(user_input: str) -> AgentState:
+    """One-shot CLI run that closes the checkpointer afterwards.
+
+    aiosqlite's connection is a non-daemon thread once awaited, so
+    without the close the interpreter hangs after printing the result.
+    """
+    try:
+        return await graph.ainvoke({"input": user_input}, thread_config(user_input))
+    finally:
+        await _checkpointer.conn.close()
+
 
 if __name__ == "__main__":
     try:
         user_input = input("Enter your query: ")
-        result = graph.invoke({"input": user_input})
+        result = asyncio.run(_run_cli(user_input))
         print("✅ Final Result:", result["final_result"])
         print("🧪 Keys in result:", result.keys())
         print(result)
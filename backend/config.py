@@ -1,4 +1,5 @@
 import os
+from dataclasses import dataclass, field
 from pathlib import Path
 from dotenv import load_dotenv
 from typing import List, Optional
@@ -7,6 +8,19 @@ from typing import List, Optional
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(env_path)
 
+
+def _optional_path(var: str) -> Optional[str]:
+    """Resolve a path env var, or None when it is unset/empty.
+
+    Running abspath on '' would silently resolve to the current working
+    directory, which is both wrong and a needless getcwd() at import.
+    """
+    value = os.getenv(var)
+    return os.path.abspath(os.path.expanduser(value)) if value else None
+
+# Frozen + slots: attribute reads skip the instance __dict__ on hot paths
+# and the settings cannot be mutated accidentally at runtime.
+@dataclass(frozen=True, slots=True)
 class Config:
     # Application
     ENV: str = os.getenv('ENVIRONMENT', 'development')
@@ -19,17 +33,26 @@ class Config:
     PORT: int = int(os.getenv('PORT', '8000'))
     
     # CORS
-    CORS_ORIGINS: List[str] = os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
+    CORS_ORIGINS: List[str] = field(
+        default_factory=lambda: os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
+    )
     
     # Google Earth Engine
     EE_PROJECT_ID: str = os.getenv('EE_PROJECT_ID', 'team-og-isro')
     EE_SERVICE_ACCOUNT: Optional[str] = os.getenv('EE_SERVICE_ACCOUNT')
-    EE_PRIVATE_KEY_PATH: Optional[str] = os.path.abspath(os.path.expanduser(os.getenv('EE_PRIVATE_KEY_PATH', '')))
-    GOOGLE_APPLICATION_CREDENTIALS: Optional[str] = os.path.abspath(os.path.expanduser(os.getenv('GOOGLE_APPLICATION_CREDENTIALS', '')))
+    EE_PRIVATE_KEY_PATH: Optional[str] = _optional_path('EE_PRIVATE_KEY_PATH')
+    GOOGLE_APPLICATION_CREDENTIALS: Optional[str] = _optional_path('GOOGLE_APPLICATION_CREDENTIALS')
     
+    # Redis (response/tile cache; caching is skipped when unreachable)
+    REDIS_URL: str = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
     # LLM Configuration
     GROQ_API_KEY: Optional[str] = os.getenv('GROQ_API_KEY')
     GROQ_MODEL: str = os.getenv('GROQ_MODEL', 'llama3-70b-8192')
+    AI_CACHE_TTL: int = int(os.getenv('AI_CACHE_TTL', '3600'))
+    # Optional local SetFit model directory for intent classification;
+    # keyword matching is used when unset.
+    INTENT_MODEL_PATH: Optional[str] = _optional_path('INTENT_MODEL_PATH')
     
     # Default coordinates for Coimbatore, Tamil Nadu (ISRO region)
     DEFAULT_LAT: float = 11.0168
@@ -0,0 +1,10 @@
+import os
+
+# Process-level parallelism around the GIL-bound Earth Engine client:
+# each worker runs its own event loop on its own core.
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = 2 * (os.cpu_count() or 1) + 1
+worker_class = "uvloop_worker.UvloopUvicornWorker"
+worker_connections = 1000
+timeout = 60
+keepalive = 5
@@ -1,18 +1,41 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+import anyio.to_thread
+import asyncio
+import httpx
 import uvicorn
 from datetime import datetime, timedelta
-import json
+import functools
+import hashlib
+import orjson
 import os
 import logging
-import importlib
-import ee
-import geemap
+import queue
+from logging.handlers import QueueHandler, QueueListener
+import cachetools
 from typing import Optional, Dict, Any
 
+# geemap and the agent graph (the heaviest transitive imports) are
+# imported lazily inside the functions that need them, so cold starts
+# during rolling deploys stay fast. `ee` itself still loads at startup
+# via the services import below — the service layer uses it throughout —
+# so only the geemap/agent cost is deferred. sys.modules makes repeat
+# imports free.
+
 def initialize_earth_engine() -> None:
-    """Initialize Earth Engine with service account credentials if available."""
+    """Initialize Earth Engine with service account credentials if available.
+
+    Safe to call repeatedly: once credentials are set the call returns
+    immediately, so the credential probing and (worst case) interactive
+    ee.Authenticate() fallback run at most once per process.
+    """
+    import ee
+    if ee.data._credentials:
+        return
     try:
         if config.GOOGLE_APPLICATION_CREDENTIALS and os.path.exists(config.GOOGLE_APPLICATION_CREDENTIALS):
             credentials = ee.ServiceAccountCredentials(
@@ -39,21 +62,26 @@ def initialize_earth_engine() -> None:
                 detail=f"Failed to initialize Earth Engine: {str(auth_error)}"
             )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('earth_engine_realtime.log')
-    ]
-)
+# Configure logging. Records are queued and formatted/written on a
+# background thread so file I/O from chatty paths (the tile proxy logs
+# per request) never stalls the event loop.
+_log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+_log_handlers = [logging.StreamHandler(), logging.FileHandler('earth_engine_realtime.log')]
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+_log_queue = queue.Queue(-1)
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(_log_queue)])
+_log_listener = QueueListener(_log_queue, *_log_handlers, respect_handler_level=True)
+_log_listener.start()
 logger = logging.getLogger(__name__)
 
+from redis import asyncio as aioredis
+
 from config import config
 from models.data_models import (
-    QueryRequest, LocationAnalysisRequest, AnalysisResponse, 
-    MapLayersResponse, RegionalAnalysisRequest, Coordinates
+    QueryRequest, LocationAnalysisRequest, AnalysisResponse,
+    MapLayersResponse, RegionalAnalysisRequest, Coordinates,
+    PointsAnalysisRequest
 )
 from services.geospatial_service import geospatial_service
 
@@ -61,18 +89,174 @@ from services.geospatial_service import geospatial_service
 app = FastAPI(
     title="Disaster Eye Earth Engine API",
     description="Geospatial disaster analysis using Google Earth Engine and AI",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
-# Initialize app state for storing maps
+# Initialize app state
 class AppState:
     def __init__(self):
-        self.current_maps = {}
         self.request_count = 0
         self.last_request_time = None
 
 app.state = AppState()
 
+# Redis-backed response cache for Earth Engine mapid/token payloads. A
+# getMapId round-trip costs seconds while the signed tile URLs stay valid
+# for hours, so identical (dataset, lat, lng, zoom) requests are replayed
+# from cache — and shared across Gunicorn workers, unlike an in-process
+# dict. When Redis is unreachable the cache degrades to a no-op.
+redis_cache: Optional["aioredis.Redis"] = None
+
+# ISO timestamp refreshed once per second by a background task; the
+# health endpoints that load balancers poll shouldn't allocate and
+# format a datetime per request.
+_NOW_ISO = [datetime.now().isoformat()]
+
+@app.on_event("startup")
+async def start_clock():
+    async def _tick():
+        while True:
+            _NOW_ISO[0] = datetime.now().isoformat()
+            await asyncio.sleep(1)
+    asyncio.create_task(_tick())
+
+@app.on_event("startup")
+async def init_earth_engine_once():
+    """Pay the Earth Engine auth cost once, not per request."""
+    # EE calls run in the threadpool; default 40 tokens is tight once
+    # tile bursts and analysis requests overlap
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 64
+    try:
+        initialize_earth_engine()
+        _ee_images()  # warm the shared dataset graphs
+    except Exception as e:
+        # Handlers will retry via the _credentials guard; don't block boot
+        logger.error(f"Earth Engine startup initialization failed: {e}")
+
+@app.on_event("startup")
+async def connect_redis():
+    global redis_cache
+    try:
+        client = aioredis.from_url(config.REDIS_URL, decode_responses=True)
+        await client.ping()
+        redis_cache = client
+        logger.info("Redis response cache connected")
+    except Exception as e:
+        logger.warning(f"Redis unavailable, response caching disabled: {e}")
+        redis_cache = None
+
+async def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+    """Fetch a cached JSON payload, or None on miss / Redis trouble."""
+    if redis_cache is None:
+        return None
+    try:
+        payload = await redis_cache.get(key)
+        return orjson.loads(payload) if payload else None
+    except Exception as e:
+        logger.warning(f"Redis read failed for {key}: {e}")
+        return None
+
+async def _cache_set(key: str, payload: Dict[str, Any], ttl: int = 3600) -> None:
+    """Store a JSON payload with a TTL, ignoring Redis trouble."""
+    if redis_cache is None:
+        return
+    try:
+        await redis_cache.setex(key, ttl, orjson.dumps(payload))
+    except Exception as e:
+        logger.warning(f"Redis write failed for {key}: {e}")
+
+# Shared client for the tile proxy: tiles stream straight from Earth
+# Engine to the socket instead of being buffered per request. HTTP/2 +
+# keep-alive lets bursts of tiles multiplex over a handful of warm
+# connections instead of paying a TLS handshake per tile.
+TILE_CLIENT = httpx.AsyncClient(
+    http2=True,
+    timeout=httpx.Timeout(30.0, connect=5.0),
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+)
+
+@app.on_event("shutdown")
+async def close_tile_client():
+    await TILE_CLIENT.aclose()
+
+# Per-layer tile URL templates live in Redis (hash ee_maps:{layer_name})
+# so a tile request can hit any Gunicorn worker, not just the one that
+# served the originating /live-layers call. A short-TTL local L1 absorbs
+# tile bursts without a Redis round-trip per tile.
+_ee_maps_l1 = cachetools.TTLCache(maxsize=256, ttl=60)
+
+async def _store_layer_maps(layer_maps: Dict[str, Dict[str, Any]]) -> None:
+    """Record tile URL templates for generated EE layers, keyed by name."""
+    for layer_name, mapping in layer_maps.items():
+        _ee_maps_l1[layer_name] = mapping
+        if redis_cache is None:
+            continue
+        try:
+            await redis_cache.hset(f"ee_maps:{layer_name}", mapping=mapping)
+            await redis_cache.expire(f"ee_maps:{layer_name}", 7200)
+        except Exception as e:
+            logger.warning(f"Redis write failed for ee_maps:{layer_name}: {e}")
+
+async def _load_layer_map(layer_name: str) -> Optional[Dict[str, Any]]:
+    """Fetch a layer's tile URL template from L1, then Redis."""
+    mapping = _ee_maps_l1.get(layer_name)
+    if mapping:
+        return mapping
+    if redis_cache is None:
+        return None
+    try:
+        mapping = await redis_cache.hgetall(f"ee_maps:{layer_name}")
+    except Exception as e:
+        logger.warning(f"Redis read failed for ee_maps:{layer_name}: {e}")
+        return None
+    if mapping:
+        _ee_maps_l1[layer_name] = mapping
+        return mapping
+    return None
+
+def _cacheable_json(request: Request, payload: Dict[str, Any], max_age: int = 600) -> Response:
+    """Serve a JSON payload with Cache-Control + ETag, answering 304s.
+
+    Lets browsers and reverse proxies short-circuit repeated identical
+    GETs without touching Earth Engine at all.
+    """
+    body = orjson.dumps(payload, default=str)
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"Cache-Control": f"public, max-age={max_age}", "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Compress the chatty nested-JSON payloads (layers, markers, map_data);
+# streamed routes are excluded below since minimum_size only applies to
+# non-streamed responses
+app.add_middleware(GZipMiddleware, minimum_size=500)
+
+# Streamed routes where gzip hurts: SSE events would sit in the zlib
+# buffer until the stream closes (no mid-stream flush), and tile PNGs
+# are already compressed, so recompressing the hottest route just burns
+# CPU.
+_NO_GZIP_PATHS = ("/api/earth-engine/query/stream", "/api/earth-engine/tiles/")
+
+class _NoGzipRoutes:
+    """Strip Accept-Encoding on selected routes so GZipMiddleware skips them."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(_NO_GZIP_PATHS):
+            scope = dict(scope)
+            scope["headers"] = [
+                (k, v) for k, v in scope["headers"] if k != b"accept-encoding"
+            ]
+        await self.app(scope, receive, send)
+
+# Added after GZipMiddleware so it runs first and GZip never sees an
+# Accept-Encoding header on the excluded routes
+app.add_middleware(_NoGzipRoutes)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -83,25 +267,28 @@ app.add_middleware(
 )
 
 @app.get("/")
-async def root():
+async def root(response: Response):
     """API health check"""
     logger.info("🌐 Health check request received")
+    # Slowly-changing status: let clients reuse it briefly
+    response.headers["Cache-Control"] = "public, max-age=30"
     return {
         "message": "Disaster Eye Earth Engine API",
         "status": "active",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": _NOW_ISO[0],
         "earth_engine_status": geospatial_service.ee_service.initialized
     }
 
 @app.get("/health")
-async def health_check():
+async def health_check(response: Response):
     """Detailed health check"""
     logger.info(" Detailed health check request received")
+    response.headers["Cache-Control"] = "public, max-age=30"
     return {
         "api_status": "healthy",
         "earth_engine_initialized": geospatial_service.ee_service.initialized,
         "ai_service_available": geospatial_service.ai_service.available,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": _NOW_ISO[0]
     }
 
 @app.post("/api/earth-engine/query", response_model=AnalysisResponse)
@@ -114,15 +301,18 @@ async def process_natural_query(request: QueryRequest):
     
     try:
         if request.coordinates:
-            # Process location-based query
-            result = geospatial_service.process_location_query(
+            # Process location-based query off the event loop
+            result = await run_in_threadpool(
+                geospatial_service.process_location_query,
                 lat=request.coordinates.lat,
                 lng=request.coordinates.lng,
                 query=request.query
             )
         else:
             # Process general query without specific location
-            ai_analysis = geospatial_service.ai_service.process_natural_query(request.query)
+            ai_analysis = await run_in_threadpool(
+                geospatial_service.ai_service.process_natural_query, request.query
+            )
             result = {
                 'timestamp': datetime.now().isoformat(),
                 'status': 'completed',
@@ -131,12 +321,38 @@ async def process_natural_query(request: QueryRequest):
             }
         
         logger.info(f"Query processed successfully")
-        return AnalysisResponse(**result)
+        # Service output is trusted; skip re-validating every field
+        return AnalysisResponse.model_construct(**result)
         
     except Exception as e:
         logger.error(f"Query processing failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Query processing failed: {str(e)}")
 
+@app.post("/api/earth-engine/query/stream")
+async def stream_natural_query(request: QueryRequest):
+    """Stream a natural language answer as Server-Sent Events.
+
+    Tokens are forwarded to the client as they leave the model, so
+    first-byte latency is the model's time-to-first-token rather than
+    the full generation; intent and suggested actions arrive in the
+    initial event.
+    """
+    logger.info(f"Streaming query request: {request.query}")
+    location = None
+    if request.coordinates:
+        location = {'lat': request.coordinates.lat, 'lng': request.coordinates.lng}
+
+    async def _events():
+        async for event in geospatial_service.ai_service.stream_natural_query(
+                request.query, location):
+            yield b"data: " + orjson.dumps(event) + b"\n\n"
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.post("/api/earth-engine/analyze-location")
 async def analyze_location(request: LocationAnalysisRequest):
     """Analyze specific location for disaster vulnerability"""
@@ -144,30 +360,44 @@ async def analyze_location(request: LocationAnalysisRequest):
     logger.info(f" Location analysis request: lat={request.coordinates.lat}, lng={request.coordinates.lng}")
     
     try:
-        result = geospatial_service.process_location_query(
+        result = await run_in_threadpool(
+            geospatial_service.process_location_query,
             lat=request.coordinates.lat,
             lng=request.coordinates.lng,
             query="Comprehensive disaster vulnerability analysis" if request.include_ai else None
         )
         
         logger.info(f" Location analysis completed successfully")
-        return AnalysisResponse(**result)
+        return AnalysisResponse.model_construct(**result)
         
     except Exception as e:
         logger.error(f"Location analysis failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Location analysis failed: {str(e)}")
 
 @app.get("/api/earth-engine/map-layers")
-async def get_map_layers(lat: float = config.DEFAULT_LAT, lng: float = config.DEFAULT_LNG, zoom: int = 10):
+async def get_map_layers(
+    request: Request,
+    lat: float = Query(config.DEFAULT_LAT, ge=-90, le=90),
+    lng: float = Query(config.DEFAULT_LNG, ge=-180, le=180),
+    zoom: int = Query(10, ge=0, le=22)
+):
     """Get Earth Engine map layers for visualization"""
-    
+
     logger.info(f" Map layers request: lat={lat}, lng={lng}, zoom={zoom}")
-    
+
     try:
-        result = geospatial_service.get_map_layers(lat, lng, zoom)
+        result = await run_in_threadpool(geospatial_service.get_map_layers, lat, lng, zoom)
+        # The service reports failure in-band as {'error', 'timestamp'};
+        # model_construct skips the validation that used to reject that
+        # shape, so check explicitly before the payload is cached as a
+        # 200 with public max-age.
+        if 'error' in result:
+            raise HTTPException(status_code=500, detail=result['error'])
         logger.info(f"Map layers retrieved successfully")
-        return MapLayersResponse(**result)
-        
+        return _cacheable_json(request, MapLayersResponse.model_construct(**result).model_dump())
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f" Failed to get map layers: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get map layers: {str(e)}")
@@ -179,20 +409,26 @@ async def analyze_region(request: RegionalAnalysisRequest):
     logger.info(f" Regional analysis request: bounds={request.bounds.dict()}, type={request.analysis_type}")
     
     try:
-        result = geospatial_service.get_regional_analysis(
+        result = await run_in_threadpool(
+            geospatial_service.get_regional_analysis,
             bounds=request.bounds.dict(),
             analysis_type=request.analysis_type
         )
         
         logger.info(f" Regional analysis completed successfully")
-        return AnalysisResponse(**result)
+        return AnalysisResponse.model_construct(**result)
         
     except Exception as e:
         logger.error(f" Regional analysis failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Regional analysis failed: {str(e)}")
 
 @app.get("/api/earth-engine/flood-analysis")
-async def get_flood_analysis(lat: float, lng: float, radius: float = 5000):
+async def get_flood_analysis(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(5000, gt=0, le=50000)
+):
     """Get flood analysis for specific coordinates"""
     
     logger.info(f" Flood analysis request: lat={lat}, lng={lng}, radius={radius}")
@@ -201,17 +437,28 @@ async def get_flood_analysis(lat: float, lng: float, radius: float = 5000):
         if not geospatial_service.ee_service.initialized:
             logger.error(" Earth Engine not initialized for flood analysis")
             raise HTTPException(status_code=503, detail="Earth Engine not initialized")
-        
-        result = geospatial_service.ee_service.get_flood_analysis(lat, lng, radius)
+
+        cache_key = f"flood:{round(lat, 3)}:{round(lng, 3)}:{radius}"
+        cached = await _cache_get(cache_key)
+        if cached:
+            return _cacheable_json(request, cached)
+
+        result = await run_in_threadpool(geospatial_service.ee_service.get_flood_analysis, lat, lng, radius)
         logger.info(f" Flood analysis completed: risk_level={result.get('risk_level', 'Unknown')}")
-        return result
+        await _cache_set(cache_key, result)
+        return _cacheable_json(request, result)
         
     except Exception as e:
         logger.error(f" Flood analysis failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Flood analysis failed: {str(e)}")
 
 @app.get("/api/earth-engine/building-analysis")
-async def get_building_analysis(lat: float, lng: float, radius: float = 2000):
+async def get_building_analysis(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(2000, gt=0, le=50000)
+):
     """Get building analysis for specific coordinates"""
     
     logger.info(f" Building analysis request: lat={lat}, lng={lng}, radius={radius}")
@@ -220,137 +467,253 @@ async def get_building_analysis(lat: float, lng: float, radius: float = 2000):
         if not geospatial_service.ee_service.initialized:
             logger.error(" Earth Engine not initialized for building analysis")
             raise HTTPException(status_code=503, detail="Earth Engine not initialized")
-        
-        result = geospatial_service.ee_service.get_building_analysis(lat, lng, radius)
+
+        cache_key = f"building:{round(lat, 3)}:{round(lng, 3)}:{radius}"
+        cached = await _cache_get(cache_key)
+        if cached:
+            return _cacheable_json(request, cached)
+
+        result = await run_in_threadpool(geospatial_service.ee_service.get_building_analysis, lat, lng, radius)
         logger.info(f" Building analysis completed: total_buildings={result.get('total_buildings', 0)}")
-        return result
+        await _cache_set(cache_key, result)
+        return _cacheable_json(request, result)
         
     except Exception as e:
         logger.error(f" Building analysis failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Building analysis failed: {str(e)}")
 
+@app.post("/api/earth-engine/analyze-points")
+async def analyze_points(request: PointsAnalysisRequest):
+    """Score a batch of points in one Earth Engine round-trip.
+
+    Accepts a JSON array of points and dispatches to the batched
+    reduceRegions pathway, so N locations cost one RPC instead of N
+    per-point analysis chains.
+    """
+    logger.info(f" Batched point analysis request: {len(request.points)} points")
+
+    try:
+        if not geospatial_service.ee_service.initialized:
+            logger.error(" Earth Engine not initialized for point analysis")
+            raise HTTPException(status_code=503, detail="Earth Engine not initialized")
+
+        results = await run_in_threadpool(
+            geospatial_service.ee_service.analyze_points,
+            [(p.lat, p.lng, p.radius) for p in request.points]
+        )
+        return {
+            'results': results,
+            'count': len(results),
+            'timestamp': datetime.now().isoformat()
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f" Batched point analysis failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batched point analysis failed: {str(e)}")
+
+# Static Google satellite basemap geemap would otherwise add for us
+_SATELLITE_TILES = "https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}"
+
+@functools.lru_cache(maxsize=1)
+def _ee_images() -> Dict[str, Any]:
+    """Shared compute-graph roots for the dataset mosaics.
+
+    Built once (after EE init) so every request reuses identical graphs
+    and Earth Engine's server-side cache sees the same asset instead of
+    a fresh mosaic node per call.
+    """
+    import ee
+    return {
+        'flood_depth': ee.ImageCollection('JRC/CEMS_GLOFAS/FloodHazard/v1').select('depth').mosaic(),
+        'elevation': ee.Image('USGS/SRTMGL1_003').select('elevation'),
+        'gsw_occurrence': ee.ImageCollection('JRC/GSW1_4/GlobalSurfaceWater').select('occurrence').mosaic(),
+    }
+
+def _flood_layer(buffered_area) -> Dict[str, Any]:
+    """Flood-hazard tile layer (one EE getMapId RPC)."""
+    clipped_flood = _ee_images()['flood_depth'].clip(buffered_area)
+    mapid = clipped_flood.getMapId({
+        'min': 0,
+        'max': 1,
+        'palette': ['#ffffff', '#0000ff']
+    })
+    return {
+        'name': 'Flood Hazard (0-1m depth)',
+        'url': mapid['tile_fetcher'].url_format,
+        'opacity': 0.7
+    }
+
+def _elevation_layer(buffered_area) -> Dict[str, Any]:
+    """SRTM elevation tile layer (one EE getMapId RPC)."""
+    mapid = _ee_images()['elevation'].clip(buffered_area).getMapId({
+        'min': 0,
+        'max': 100,
+        'palette': ['blue', 'green', 'brown', 'white']
+    })
+    return {
+        'name': 'Elevation (m)',
+        'url': mapid['tile_fetcher'].url_format,
+        'opacity': 0.6
+    }
+
+def _point_layer(point) -> Dict[str, Any]:
+    """Selected-location overlay (one EE getMapId RPC)."""
+    import ee
+    styled = ee.FeatureCollection(point).style(color='red')
+    mapid = styled.getMapId({})
+    return {
+        'name': 'Selected Location',
+        'url': mapid['tile_fetcher'].url_format,
+        'opacity': 1.0
+    }
+
+# One in-flight computation per key: when a herd of clients opens the
+# map at the same spot, the first request does the EE work and the rest
+# await its future instead of firing duplicate getMapId RPCs.
+_inflight: Dict[str, "asyncio.Future"] = {}
+
+async def _single_flight(key: str, coro_factory):
+    """Coalesce concurrent identical computations onto one future."""
+    fut = _inflight.get(key)
+    if fut is not None:
+        return await fut
+    fut = asyncio.ensure_future(coro_factory())
+    _inflight[key] = fut
+    try:
+        return await fut
+    finally:
+        _inflight.pop(key, None)
+
+async def _generate_live_layers(lat: float, lng: float, zoom: int, cache_key: str) -> Dict[str, Any]:
+    """Build, persist, and return the live-layers payload."""
+    import ee
+
+    # Area of interest: 10km buffer around the input coordinates
+    point = ee.Geometry.Point([lng, lat])
+    buffered_area = point.buffer(10000)
+
+    # The three getMapId RPCs are independent; overlap their latency
+    flood, elevation, marker = await asyncio.gather(
+        run_in_threadpool(_flood_layer, buffered_area),
+        run_in_threadpool(_elevation_layer, buffered_area),
+        run_in_threadpool(_point_layer, point),
+    )
+
+    layers = [{
+        'id': 'layer-0',
+        'name': 'SATELLITE',
+        'url': _SATELLITE_TILES,
+        'type': 'raster',
+        'visible': True,
+        'opacity': 1.0
+    }]
+    for i, layer in enumerate((flood, elevation, marker), start=1):
+        layers.append({'id': f'layer-{i}', 'type': 'raster', 'visible': True, **layer})
+
+    # Make the tile URLs reachable from every worker's tile proxy
+    await _store_layer_maps({l['name']: {'url': l['url']} for l in layers})
+
+    # Prepare the response
+    response = {
+        'center': {'lat': lat, 'lng': lng},
+        'zoom': zoom,
+        'layers': layers,
+        'markers': [{
+            'position': {'lat': lat, 'lng': lng},
+            'popup': 'Selected Location',
+            'color': 'red'
+        }]
+    }
+
+    await _cache_set(cache_key, response)
+    return response
+
 @app.get("/api/earth-engine/live-layers")
-async def get_live_layers(lat: float, lng: float, zoom: int = 12):
+async def get_live_layers(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    zoom: int = Query(12, ge=0, le=22)
+):
     """Get Earth Engine live layers for frontend visualization"""
     try:
-        # Initialize Earth Engine
-        initialize_earth_engine()
+        # Coordinates are rounded to ~100m so nearby clicks share an entry
+        cache_key = f"livelayers:{round(lat, 3)}:{round(lng, 3)}:{zoom}"
+        cached = await _cache_get(cache_key)
+        if cached:
+            logger.info(f"Live layers served from cache: {cache_key}")
+            return cached
+
+        return await _single_flight(
+            cache_key, lambda: _generate_live_layers(lat, lng, zoom, cache_key)
+        )
 
-        # Create a map centered on the provided coordinates
-        m = geemap.Map(center=[lat, lng], zoom=zoom)
-        
-        # Add base map
-        m.add_basemap("SATELLITE")
-        
-        # Create a point from the input coordinates
-        point = ee.Geometry.Point([lng, lat])
-        
-        # Create a buffer around the point (10km radius)
-        buffered_area = point.buffer(10000)  # 10km in meters
-        
-        # Load JRC Global Flood Hazard dataset
-        dataset = ee.ImageCollection('JRC/CEMS_GLOFAS/FloodHazard/v1')
-        
-        # Get the flood depth layer (0-1m)
-        flood_depth = dataset.select('depth').mosaic()
-        
-        # Clip to the area of interest
-        clipped_flood = flood_depth.clip(buffered_area)
-        
-        # Add the flood hazard layer with a blue color scale
-        m.addLayer(clipped_flood, {
-            'min': 0,
-            'max': 1,
-            'palette': ['#ffffff', '#0000ff'],
-            'opacity': 0.7
-        }, 'Flood Hazard (0-1m depth)')
-        
-        # Add terrain data for context
-        elevation = ee.Image('USGS/SRTMGL1_003').select('elevation')
-        m.addLayer(elevation.clip(buffered_area), {
-            'min': 0,
-            'max': 100,
-            'palette': ['blue', 'green', 'brown', 'white'],
-            'opacity': 0.6
-        }, 'Elevation (m)')
-        
-        # Add a point for the selected location
-        m.addLayer(point, {'color': 'red'}, 'Selected Location')
-        
-        # Get the map ID and token for each layer
-        layers = []
-        for i, layer in enumerate(m.layers):
-            if hasattr(layer, 'url'):
-                layers.append({
-                    'id': f'layer-{i}',
-                    'name': layer.name,
-                    'url': layer.url,
-                    'type': 'raster',
-                    'visible': True,
-                    'opacity': 0.7 if 'Flood' in layer.name else 0.6
-                })
-        
-        # Prepare the response
-        response = {
-            'center': {'lat': lat, 'lng': lng},
-            'zoom': zoom,
-            'layers': layers,
-            'markers': [{
-                'position': {'lat': lat, 'lng': lng},
-                'popup': 'Selected Location',
-                'color': 'red'
-            }]
-        }
-        
-        return response
-        
     except Exception as e:
         logger.error(f"Error in get_live_layers: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _build_test_map(center_lat: float, center_lng: float) -> list:
+    """Build the test map layers via direct getMapId calls.
+
+    Synchronous EE work; run in the threadpool. Capturing each MapId as
+    it is created replaces the old geemap.Map + hasattr(layer, 'url')
+    scan and avoids constructing an interactive map widget per request.
+    """
+    import ee
+
+    # Sample Earth Engine layer (Global Surface Water)
+    occurrence_mapid = _ee_images()['gsw_occurrence'].getMapId({
+        'min': 0,
+        'max': 100,
+        'palette': ['#ffffff', '#0000ff']
+    })
+
+    # Point overlay for the default location
+    point = ee.Geometry.Point([center_lng, center_lat])
+    point_mapid = ee.FeatureCollection(point).style(color='red').getMapId({})
+
+    return [
+        {
+            'id': 'layer-0',
+            'name': 'SATELLITE',
+            'url': _SATELLITE_TILES,
+            'type': 'raster',
+            'visible': True,
+            'opacity': 1.0
+        },
+        {
+            'id': 'layer-1',
+            'name': 'Water Occurrence',
+            'url': occurrence_mapid['tile_fetcher'].url_format,
+            'type': 'raster',
+            'visible': True,
+            'opacity': 0.7
+        },
+        {
+            'id': 'layer-2',
+            'name': 'Default Location',
+            'url': point_mapid['tile_fetcher'].url_format,
+            'type': 'raster',
+            'visible': True,
+            'opacity': 0.7
+        },
+    ]
+
 @app.get("/api/earth-engine/test-map")
 async def get_test_map():
     """Get Earth Engine test map data for frontend visualization"""
     try:
-        # Initialize Earth Engine
-        initialize_earth_engine()
+        cached = await _cache_get("testmap:v1")
+        if cached:
+            return cached
 
-        # Create a map centered on default location (India)
+        # Map centered on default location (India)
         center_lat, center_lng = 20.5937, 78.9629
-        m = geemap.Map(center=[center_lat, center_lng], zoom=5)
-        
-        # Add base map
-        m.add_basemap("SATELLITE")
-        
-        # Add a sample Earth Engine layer (Global Surface Water)
-        dataset = ee.ImageCollection('JRC/GSW1_4/GlobalSurfaceWater')
-        occurrence = dataset.select('occurrence').mosaic()
-        
-        # Add the water occurrence layer
-        m.addLayer(occurrence, {
-            'min': 0,
-            'max': 100,
-            'palette': ['#ffffff', '#0000ff'],
-            'opacity': 0.7
-        }, 'Water Occurrence')
-        
-        # Add a point for the default location
-        point = ee.Geometry.Point([center_lng, center_lat])
-        m.addLayer(point, {'color': 'red'}, 'Default Location')
-        
-        # Get the map ID and token for each layer
-        layers = []
-        for i, layer in enumerate(m.layers):
-            if hasattr(layer, 'url'):
-                layers.append({
-                    'id': f'layer-{i}',
-                    'name': layer.name,
-                    'url': layer.url,
-                    'type': 'raster',
-                    'visible': True,
-                    'opacity': 0.7
-                })
-        
+        layers = await run_in_threadpool(_build_test_map, center_lat, center_lng)
+
+        await _store_layer_maps({l['name']: {'url': l['url']} for l in layers})
+
         # Prepare the response
         response = {
             'status': 'success',
@@ -364,9 +727,10 @@ async def get_test_map():
             }],
             'timestamp': datetime.now().isoformat()
         }
-        
+
+        await _cache_set("testmap:v1", response)
         return response
-            
+
     except Exception as e:
         error_msg = f"Error in get_test_map: {str(e)}"
         logger.error(error_msg)
@@ -376,23 +740,38 @@ async def get_test_map():
             'timestamp': datetime.now().isoformat()
         }
 
+# Snapshot once; the flag never changes at runtime and the error path
+# shouldn't pay an attribute lookup per failure
+_DEBUG = config.DEBUG
+
 @app.exception_handler(500)
 async def internal_error_handler(request: Request, exc: Exception):
     """Handle 500 errors"""
+    if isinstance(exc, HTTPException):
+        # Let FastAPI serialize the detail without walking the stack
+        raise exc
     logger.error(f"Unexpected error: {str(exc)}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "status": "error",
             "message": "An unexpected error occurred while processing your request.",
-            "details": str(exc) if config.DEBUG else "Internal server error"
+            "details": str(exc) if _DEBUG else "Internal server error",
+            "timestamp": _NOW_ISO[0]
         }
     )
+
+@functools.lru_cache(maxsize=1)
+def _agent():
+    """Import the LangGraph agent (and its LangChain stack) once per worker."""
+    from agent import graph, thread_config
+    return graph, thread_config
+
 @app.post("/api/agent")
 async def agent_endpoint(request: Request):
     """Handle agent queries from the frontend"""
     try:
-        data = await request.json()
+        data = orjson.loads(await request.body())
         user_input = data.get("input", "")
         location = data.get("location") or {}
         
@@ -413,9 +792,10 @@ async def agent_endpoint(request: Request):
         
         try:
             # Process the input through the agent workflow
-            from agent import graph
-            result = graph.invoke(state)
-            logger.info(f"Agent processing completed - Result: {result}")
+            graph, thread_config = _agent()
+            result = await graph.ainvoke(state, thread_config(user_input))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Agent processing completed - Result: {result}")
             
             # Prepare the response with default values
             response_data = {
@@ -465,15 +845,17 @@ async def agent_endpoint(request: Request):
                     "lng": result["lon"]
                 }
             
-            # Log the response being sent to the frontend
-            logger.info(f"Sending response to frontend: {response_data}")
+            # Stringifying the whole response dict is only worth it when
+            # someone is actually debugging
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Sending response to frontend: {response_data}")
             
-            return JSONResponse(content=response_data)
+            return ORJSONResponse(content=response_data)
             
         except Exception as agent_error:
             logger.error(f"Agent processing error: {str(agent_error)}", exc_info=True)
             # Return a helpful error response with default coordinates
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=500,
                 content={
                     "status": "error",
@@ -490,7 +872,7 @@ async def agent_endpoint(request: Request):
             
     except Exception as e:
         logger.error(f"Agent error: {str(e)}", exc_info=True)
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={
                 "status": "error", 
@@ -499,66 +881,91 @@ async def agent_endpoint(request: Request):
             }
         )
 
+# L1 cache for tile bodies: a user panning a 3x3/5x5 grid revisits the
+# same tiles within seconds, so the last ~2048 small PNGs (<128KB each)
+# are served from memory without touching httpx, Redis, or Nginx.
+_TILE_LRU = cachetools.LRUCache(maxsize=2048)
+_TILE_LRU_MAX_BODY = 128 * 1024
+_TILE_HEADERS = {
+    "Cache-Control": "public, max-age=86400",  # Cache for 24 hours
+    "Access-Control-Allow-Origin": "*"
+}
+
 @app.get("/api/earth-engine/tiles/{layer_name}/{z}/{x}/{y}")
 async def get_tile_proxy(layer_name: str, z: int, x: int, y: int):
     """Proxy endpoint to serve Earth Engine tiles with proper parameters"""
-    
-    logger.info(f" TILE REQUEST: {layer_name}/{z}/{x}/{y}")
-    
+
+    logger.debug(f" TILE REQUEST: {layer_name}/{z}/{x}/{y}")
+
     try:
-        # Check if we have stored map data
-        if not hasattr(app.state, 'current_maps') or layer_name not in app.state.current_maps:
+        # Check if we have stored map data (L1 cache, then Redis)
+        map_data = await _load_layer_map(layer_name)
+        if map_data is None:
             # If no maps are stored, generate them first with default coordinates
             logger.info(f"🔄 No maps found, generating maps for tile request: {layer_name}")
-            await get_live_layers(lat=11.0168, lng=76.9558)  # Use default coordinates
-            
+            # Direct Python call: zoom must be passed explicitly, or it
+            # stays bound to the Query(...) FieldInfo default and poisons
+            # the cache key.
+            await get_live_layers(lat=config.DEFAULT_LAT, lng=config.DEFAULT_LNG, zoom=12)
+
             # Check again
-            if layer_name not in app.state.current_maps:
-                logger.error(f" Layer '{layer_name}' not found in current_maps: {list(app.state.current_maps.keys())}")
+            map_data = await _load_layer_map(layer_name)
+            if map_data is None:
+                logger.error(f" Layer '{layer_name}' not found even after generation")
                 raise HTTPException(status_code=404, detail=f"Layer '{layer_name}' not found even after generation")
+
+        # Tile bodies are keyed by the signed URL template, not the layer
+        # name: names are fixed strings reused for every location, and
+        # regenerating /live-layers for new coordinates re-signs the
+        # template — a name-only key would keep serving the previous
+        # location's imagery at overlapping z/x/y. Stale entries for the
+        # old template simply age out of the LRU.
+        tile_key = (map_data['url'], z, x, y)
+        cached_tile = _TILE_LRU.get(tile_key)
+        if cached_tile is not None:
+            return Response(content=cached_tile, media_type="image/png", headers=_TILE_HEADERS)
+
+        # The stored URL is a {z}/{x}/{y} template signed by Earth Engine
+        tile_url = map_data['url'].format(z=z, x=x, y=y)
+
+        logger.debug(f" Proxying tile request: {tile_url}")
         
-        map_data = app.state.current_maps[layer_name]
-        logger.info(f" Map data for {layer_name}: mapid={map_data['mapid'][:10]}...")
-        
-        # Use the tile_fetcher object directly (newer EE API approach)
-        tile_fetcher = map_data.get('tile_fetcher')
-        if tile_fetcher:
-            # Use the tile_fetcher to get the actual tile URL
-            try:
-                tile_url = tile_fetcher.getTileUrl(z, x, y)
-                logger.info(f" Using tile_fetcher URL: {tile_url}")
-            except Exception as e:
-                logger.error(f" Error getting tile URL from tile_fetcher: {e}")
-                # Fallback to manual URL construction
-                tile_url = f"https://earthengine.googleapis.com/v1alpha/{map_data['mapid']}/tiles/{z}/{x}/{y}?token={map_data.get('token', '')}"
-        else:
-            # Fallback to manual URL construction
-            tile_url = f"https://earthengine.googleapis.com/v1alpha/{map_data['mapid']}/tiles/{z}/{x}/{y}?token={map_data.get('token', '')}"
-        
-        logger.info(f" Proxying tile request: {tile_url}")
-        
-        # Fetch the tile from Google Earth Engine
-        import httpx
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                response = await client.get(tile_url)
-            
-                if response.status_code == 200:
-                    logger.info(f" Tile served successfully: {len(response.content)} bytes")
-                    return Response(
-                        content=response.content,
-                        media_type="image/png",
-                        headers={
-                            "Cache-Control": "public, max-age=86400",  # Cache for 24 hours
-                            "Access-Control-Allow-Origin": "*"
-                        }
-                    )
-                else:
-                    logger.error(f" Earth Engine responded with status {response.status_code}")
-                    raise HTTPException(status_code=response.status_code, detail="Failed to fetch tile from Earth Engine")
-            except httpx.ReadError as e:
-                logger.error(f" ReadError fetching tile: {e} for URL: {tile_url}")
-                raise HTTPException(status_code=502, detail="Error reading tile from Earth Engine")
+        # Stream the tile from Google Earth Engine straight to the client
+        try:
+            upstream = await TILE_CLIENT.send(
+                TILE_CLIENT.build_request("GET", tile_url), stream=True
+            )
+
+            if upstream.status_code != 200:
+                await upstream.aclose()
+                logger.error(f" Earth Engine responded with status {upstream.status_code}")
+                raise HTTPException(status_code=upstream.status_code, detail="Failed to fetch tile from Earth Engine")
+
+            headers = dict(_TILE_HEADERS)
+            if "etag" in upstream.headers:
+                headers["ETag"] = upstream.headers["etag"]
+
+            async def _relay():
+                # Tee the stream into the L1 cache, bailing on big tiles
+                buf = bytearray()
+                async for chunk in upstream.aiter_raw(chunk_size=32768):
+                    if buf is not None:
+                        buf.extend(chunk)
+                        if len(buf) > _TILE_LRU_MAX_BODY:
+                            buf = None
+                    yield chunk
+                if buf is not None:
+                    _TILE_LRU[tile_key] = bytes(buf)
+
+            return StreamingResponse(
+                _relay(),
+                media_type="image/png",
+                headers=headers,
+                background=BackgroundTask(upstream.aclose)
+            )
+        except httpx.ReadError as e:
+            logger.error(f" ReadError fetching tile: {e} for URL: {tile_url}")
+            raise HTTPException(status_code=502, detail="Error reading tile from Earth Engine")
                 
     except Exception as e:
         import traceback
@@ -570,25 +977,12 @@ async def get_tile_proxy(layer_name: str, z: int, x: int, y: int):
 async def not_found_handler(request, exc):
     """Custom 404 handler"""
     logger.warning(f" 404 Error: {request.url}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=404,
         content={
             "error": "Endpoint not found",
             "message": "The requested API endpoint does not exist",
-            "timestamp": datetime.now().isoformat()
-        }
-    )
-
-@app.exception_handler(500)
-async def internal_error_handler(request, exc):
-    """Custom 500 handler"""
-    logger.error(f"500 Error: {str(exc)}")
-    return JSONResponse(
-        status_code=500,
-        content={
-            "error": "Internal server error",
-            "message": "An unexpected error occurred",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _NOW_ISO[0]
         }
     )
 
@@ -596,11 +990,17 @@ if __name__ == "__main__":
     print(f" Starting Disaster Eye Earth Engine API...")
     print(f" Default location: {config.DEFAULT_LAT}, {config.DEFAULT_LNG}")
     print(f"Frontend URL: {config.FRONTEND_URL}")
-    
-    uvicorn.run(
-        "main:app",
-        host=config.HOST,
-        port=config.PORT,
-        reload=True,
-        log_level="info"
-    )
+
+    if os.getenv("DEV"):
+        # Local development only: single process with auto-reload
+        uvicorn.run(
+            "main:app",
+            host=config.HOST,
+            port=config.PORT,
+            reload=True,
+            log_level="info"
+        )
+    else:
+        # A single reloading Uvicorn process pins every endpoint to one
+        # core; production runs multiple UvicornWorkers instead.
+        print("Run with: gunicorn main:app -c gunicorn.conf.py")
@@ -76,3 +76,11 @@ class RegionBounds(BaseModel):
 class RegionalAnalysisRequest(BaseModel):
     bounds: RegionBounds
     analysis_type: Optional[str] = "comprehensive"
+
+class AnalysisPoint(BaseModel):
+    lat: float = Field(..., description="Latitude")
+    lng: float = Field(..., description="Longitude")
+    radius: Optional[float] = 5000
+
+class PointsAnalysisRequest(BaseModel):
+    points: List[AnalysisPoint] = Field(..., description="Points to score in one batch")
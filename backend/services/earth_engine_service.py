@@ -1,15 +1,143 @@
 import ee
+import functools
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
+import cachetools
+import numpy as np
 from config import config
 
 # Configure logging for Earth Engine service
 logger = logging.getLogger(__name__)
 
+try:  # Optional JIT for the bulk risk-scoring kernel
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Risk codes emitted by _score_risk_codes; strings stay at the Python
+# boundary where they are cheap.
+_RISK_LEVELS = ('Low', 'Medium', 'High')
+
+
+def _score_risk_codes(flood_pct, elev):
+    """Branchless risk codes (0=Low, 1=Medium, 2=High) for arrays of
+    flood percentages and mean elevations; mirrors the scalar ladder in
+    get_combined_analysis."""
+    high = (flood_pct > 30) | (elev < 10)
+    medium = (flood_pct > 10) | (elev < 50)
+    return np.where(high, 2, np.where(medium, 1, 0)).astype(np.int8)
+
+
+if njit is not None:
+    _score_risk_codes = njit(cache=True, fastmath=True)(_score_risk_codes)
+
+
+# Dataset identifiers and the shared analysis window, resolved once at
+# import instead of inside each request handler.
+_S1_GRD_ID = 'COPERNICUS/S1_GRD'
+_S2_SR_ID = 'COPERNICUS/S2_SR'
+_SRTM_ID = 'USGS/SRTMGL1_003'
+_DATE_START, _DATE_END = '2023-01-01', '2024-12-31'
+
+# Visualization parameters for the map-layer endpoints; built once so
+# handlers neither reallocate nor accidentally mutate them.
+_VIS_RGB = {
+    'bands': ['B4', 'B3', 'B2'],
+    'min': 0,
+    'max': 3000,
+    'gamma': 1.4
+}
+_VIS_NDVI = {
+    'min': -1,
+    'max': 1,
+    'palette': ['blue', 'white', 'green']
+}
+_VIS_ELEVATION = {
+    'min': 0,
+    'max': 1000,
+    'palette': ['blue', 'green', 'yellow', 'red']
+}
+
+
+def _quantize(lat: float, lng: float, radius: float) -> Tuple[float, float, int]:
+    """Quantize an analysis region so nearby requests share cached EE
+    handles and results: coordinates snap to a 0.001-degree (~100m)
+    grid, the radius to a 500m grid. Well below the 10-30m analysis
+    scales, so results are not materially affected."""
+    return (round(lat, 3), round(lng, 3), max(500, int(round(radius / 500) * 500)))
+
+
+@functools.lru_cache(maxsize=256)
+def _region(lat_q: float, lng_q: float, radius: int) -> ee.Geometry:
+    """Buffered analysis region for a quantized location."""
+    return ee.Geometry.Point([lng_q, lat_q]).buffer(radius)
+
+
+@functools.lru_cache(maxsize=256)
+def _sentinel1_collection(lat_q: float, lng_q: float, radius: int) -> ee.ImageCollection:
+    """Filtered Sentinel-1 SAR collection for a quantized region."""
+    return ee.ImageCollection(_S1_GRD_ID) \
+        .filterBounds(_region(lat_q, lng_q, radius)) \
+        .filterDate(_DATE_START, _DATE_END) \
+        .filter(ee.Filter.eq('instrumentMode', 'IW')) \
+        .select(['VV', 'VH'])
+
+
+@functools.lru_cache(maxsize=256)
+def _sentinel2_composite(lat_q: float, lng_q: float, radius: int) -> ee.Image:
+    """Cloud-filtered Sentinel-2 median composite for a quantized region."""
+    return ee.ImageCollection(_S2_SR_ID) \
+        .filterBounds(_region(lat_q, lng_q, radius)) \
+        .filterDate(_DATE_START, _DATE_END) \
+        .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20)) \
+        .median()
+
+
+@functools.lru_cache(maxsize=1)
+def _srtm() -> ee.Image:
+    """Shared SRTM elevation image handle."""
+    return ee.Image(_SRTM_ID)
+
+
+@functools.lru_cache(maxsize=1)
+def _service_account_credentials(service_account: str, key_path: str):
+    """Service-account credentials built once per process.
+
+    The key JSON is read from disk a single time and handed to EE as
+    in-memory key data, so reinitialization never re-reads the file or
+    re-parses the key.
+    """
+    with open(key_path) as key_file:
+        key_data = key_file.read()
+    return ee.ServiceAccountCredentials(service_account, key_data=key_data)
+
+
+def _histogram_fraction(histogram: Optional[List], threshold: float,
+                        below: bool = True) -> float:
+    """Fraction of histogram mass below (or above) a threshold.
+
+    fixedHistogram returns [bucket_start, count] rows; thresholding the
+    raw-value histogram client-side lets callers sweep cutoffs without
+    another Earth Engine round-trip.
+    """
+    if not histogram:
+        return 0.0
+    hist = np.asarray(histogram, dtype=np.float64)
+    bins, counts = hist[:, 0], hist[:, 1]
+    total = counts.sum()
+    if total == 0:
+        return 0.0
+    selected = counts[bins < threshold] if below else counts[bins >= threshold]
+    return float(selected.sum() / total)
+
 class EarthEngineService:
     def __init__(self):
         self.initialized = False
+        # Materialized analysis results; each entry saves several EE
+        # round-trips when the same (quantized) region is re-requested.
+        self._analysis_cache = cachetools.TTLCache(maxsize=256, ttl=3600)
         self._initialize_ee()
     
     def _initialize_ee(self):
@@ -21,15 +149,15 @@ class EarthEngineService:
                 import os
                 if os.path.exists(config.EE_PRIVATE_KEY_PATH):
                     # Use service account authentication
-                    credentials = ee.ServiceAccountCredentials(
-                        config.EE_SERVICE_ACCOUNT, 
+                    credentials = _service_account_credentials(
+                        config.EE_SERVICE_ACCOUNT,
                         config.EE_PRIVATE_KEY_PATH
                     )
                     ee.Initialize(credentials)
                     logger.info("Google Earth Engine initialized with service account")
                     self.initialized = True
                 else:
-                    logger.error(f"Service account key file not found: {config.EE_PRIVATE_KEY_PATH}")
+                    logger.error("Service account key file not found: %s", config.EE_PRIVATE_KEY_PATH)
                     logger.info("Falling back to user authentication...")
                     # Try user authentication as fallback
                     ee.Initialize()
@@ -44,7 +172,7 @@ class EarthEngineService:
             # Don't set initialized to True here, let individual cases set it
             
         except Exception as e:
-            logger.error(f"Error initializing Google Earth Engine: {e}")
+            logger.error("Error initializing Google Earth Engine: %s", e)
             logger.info("Please ensure you have:")
             logger.info("   1. Run 'earthengine authenticate' in your terminal")
             logger.info("   2. Set up your service account JSON key file (optional)")
@@ -58,80 +186,80 @@ class EarthEngineService:
             raise Exception("Earth Engine not initialized")
         
         try:
-            logger.info(f"Getting map ID for image with visualization parameters: {vis_params}")
+            logger.debug("Getting map ID for image with visualization parameters: %s", vis_params)
             map_id = image.getMapId(vis_params)
-            logger.info(f"Map ID generated successfully: mapid={map_id['mapid'][:10]}...")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Map ID generated successfully: mapid=%s...", map_id['mapid'][:10])
             return {
                 'mapid': map_id['mapid'],
                 'token': map_id['token'],
                 'tile_url': f"https://earthengine.googleapis.com/v1alpha/projects/earthengine-legacy/maps/{map_id['mapid']}/tiles/{{z}}/{{x}}/{{y}}?token={map_id['token']}"
             }
         except Exception as e:
-            logger.error(f"Error getting map ID: {e}")
+            logger.error("Error getting map ID: %s", e)
             raise Exception(f"Error getting map ID: {e}")
     
-    def get_flood_analysis(self, lat: float, lng: float, radius: float = 5000) -> Dict:
-        """Analyze flood vulnerability for a specific location"""
+    def get_combined_analysis(self, lat: float, lng: float, radius: float = 5000) -> Dict:
+        """Compute flood, elevation, and built-up statistics in one pass.
+
+        The three reducers are composed into a single server-side
+        ee.Dictionary so one getInfo() round-trip replaces the separate
+        blocking calls the flood and building analyses used to make.
+        """
         if not self.initialized:
-            logger.error("Earth Engine not initialized for flood analysis")
+            logger.error("Earth Engine not initialized for combined analysis")
             raise Exception("Earth Engine not initialized")
-        
-        logger.info(f"Starting flood analysis: lat={lat}, lng={lng}, radius={radius}")
-        
+
+        key = ('combined',) + _quantize(lat, lng, radius)
+        cached = self._analysis_cache.get(key)
+        if cached is not None:
+            return dict(cached)
+
+        logger.info("Starting combined analysis: lat=%s, lng=%s, radius=%s", lat, lng, radius)
+
         try:
-            # Create point of interest
-            point = ee.Geometry.Point([lng, lat])
-            region = point.buffer(radius)
-            
-            logger.info("Fetching Sentinel-1 SAR data for flood detection...")
-            # Get Sentinel-1 SAR data for flood detection
-            sentinel1 = ee.ImageCollection('COPERNICUS/S1_GRD') \
-                .filterBounds(region) \
-                .filterDate('2023-01-01', '2024-12-31') \
-                .filter(ee.Filter.eq('instrumentMode', 'IW')) \
-                .select(['VV', 'VH'])
-            
-            sentinel1_count = sentinel1.size().getInfo()
-            logger.info(f"Found {sentinel1_count} Sentinel-1 images")
-            
-            # Calculate flood probability using SAR backscatter
-            if sentinel1_count > 0:
-                logger.info("Processing recent Sentinel-1 image for flood detection...")
-                recent_image = sentinel1.sort('system:time_start', False).first()
-                vv = recent_image.select('VV')
-                
-                # Simple flood detection using backscatter threshold
-                flood_threshold = -15  # dB threshold for water detection
-                flood_mask = vv.lt(flood_threshold)
-                
-                logger.info("Calculating flood area statistics...")
-                # Calculate flood area percentage
-                flood_stats = flood_mask.reduceRegion(
-                    reducer=ee.Reducer.mean(),
-                    geometry=region,
-                    scale=10,
-                    maxPixels=1e9
-                )
-                
-                flood_percentage = flood_stats.getInfo().get('VV', 0) * 100
-                logger.info(f"Calculated flood percentage: {flood_percentage:.2f}%")
-            else:
-                flood_percentage = 0
-                logger.warning("No Sentinel-1 images found for flood analysis")
-            
-            logger.info("Fetching elevation data...")
-            # Get elevation data for flood risk
-            elevation = ee.Image('USGS/SRTMGL1_003')
-            elev_stats = elevation.reduceRegion(
-                reducer=ee.Reducer.mean(),
-                geometry=region,
-                scale=30,
-                maxPixels=1e9
-            )
-            
-            avg_elevation = elev_stats.getInfo().get('elevation', 0)
-            logger.info(f"Average elevation: {avg_elevation:.2f} meters")
-            
+            quantized = _quantize(lat, lng, radius)
+            region = _region(*quantized)
+
+            # Raw-value backscatter from the most recent Sentinel-1
+            # mosaic. The mosaic is fully masked when the collection is
+            # empty, so the reducer degrades to null instead of needing
+            # a count RPC.
+            sentinel1 = _sentinel1_collection(*quantized)
+            vv = sentinel1.sort('system:time_start', False).mosaic().select('VV')
+
+            # Sentinel-2 NDBI for built-up detection
+            composite = _sentinel2_composite(*quantized)
+            nir = composite.select('B8')
+            swir = composite.select('B11')
+            ndbi = swir.subtract(nir).divide(swir.add(nir))
+
+            # Histograms of the raw values rather than thresholded
+            # masks: the water/built-up cutoffs are applied client-side,
+            # so severity tiers or threshold sweeps cost no extra EE
+            # round-trips.
+            # bestEffort lets EE coarsen the scale on very large regions
+            # instead of failing the RPC at the maxPixels ceiling.
+            combined = ee.Dictionary({
+                'flood': vv.reduceRegion(
+                    reducer=ee.Reducer.fixedHistogram(-30, 0, 60),
+                    geometry=region, scale=10, maxPixels=1e9, bestEffort=True),
+                'elevation': _srtm().reduceRegion(
+                    reducer=ee.Reducer.mean(), geometry=region, scale=30,
+                    maxPixels=1e9, bestEffort=True),
+                'built_up': ndbi.reduceRegion(
+                    reducer=ee.Reducer.fixedHistogram(-1, 1, 40),
+                    geometry=region, scale=10, maxPixels=1e9, bestEffort=True),
+            }).getInfo()
+
+            # VV below -15 dB reads as open water; NDBI above 0.1 as
+            # built-up surface.
+            flood_percentage = _histogram_fraction(
+                combined['flood'].get('VV'), -15, below=True) * 100
+            avg_elevation = combined['elevation'].get('elevation') or 0
+            built_up_percentage = _histogram_fraction(
+                combined['built_up'].get('B11'), 0.1, below=False) * 100
+
             # Calculate risk level
             if flood_percentage > 30 or avg_elevation < 10:
                 risk_level = "High"
@@ -139,170 +267,202 @@ class EarthEngineService:
                 risk_level = "Medium"
             else:
                 risk_level = "Low"
-            
-            logger.info(f"Risk level calculated: {risk_level}")
-            
+
+            lat_q, lng_q, radius_q = quantized
             result = {
                 'flood_percentage': round(flood_percentage, 2),
                 'average_elevation': round(avg_elevation, 2),
+                'built_up_percentage': round(built_up_percentage, 2),
                 'risk_level': risk_level,
-                'coordinates': {'lat': lat, 'lng': lng},
-                'analysis_radius': radius
+                'coordinates': {'lat': lat_q, 'lng': lng_q},
+                'coordinates_snapped': True,
+                'analysis_radius': radius_q
             }
-            
-            logger.info(f"Flood analysis completed successfully")
+
+            logger.info("Combined analysis completed: risk_level=%s", risk_level)
+            self._analysis_cache[key] = result
             return result
-            
+
         except Exception as e:
-            logger.error(f"Error in flood analysis: {e}")
-            raise Exception(f"Error in flood analysis: {e}")
-    
-    def get_building_analysis(self, lat: float, lng: float, radius: float = 2000) -> Dict:
-        """Analyze building density and potential damage"""
+            logger.error("Error in combined analysis: %s", e)
+            raise Exception(f"Error in combined analysis: {e}")
+
+    def get_flood_analysis(self, lat: float, lng: float, radius: float = 5000) -> Dict:
+        """Analyze flood vulnerability for a specific location"""
+        combined = self.get_combined_analysis(lat, lng, radius)
+        return {
+            'flood_percentage': combined['flood_percentage'],
+            'average_elevation': combined['average_elevation'],
+            'risk_level': combined['risk_level'],
+            'coordinates': combined['coordinates'],
+            'coordinates_snapped': True,
+            'analysis_radius': combined['analysis_radius']
+        }
+
+    def get_building_analysis(self, lat: float, lng: float, radius: float = 2000,
+                              flood_data: Optional[Dict] = None) -> Dict:
+        """Analyze building density and potential damage.
+
+        Callers that already hold a flood analysis for the same region
+        can pass it as flood_data to reuse its risk level.
+        """
+        combined = self.get_combined_analysis(lat, lng, radius)
+        built_up_percentage = combined['built_up_percentage']
+
+        # Estimate building count (rough approximation)
+        estimated_buildings = int(built_up_percentage * radius / 100)
+
+        # Simulate damage assessment based on flood risk
+        risk_level = (flood_data or combined)['risk_level']
+        damage_factor = {
+            "High": 0.35,
+            "Medium": 0.15,
+            "Low": 0.05
+        }.get(risk_level, 0.05)
+        damaged_buildings = int(estimated_buildings * damage_factor)
+
+        return {
+            'total_buildings': estimated_buildings,
+            'damaged_buildings': damaged_buildings,
+            'built_up_percentage': built_up_percentage,
+            'damage_percentage': round((damaged_buildings / max(estimated_buildings, 1)) * 100, 2),
+            'coordinates': combined['coordinates'],
+            'coordinates_snapped': True
+        }
+
+    def analyze_points(self, points: List[Tuple[float, float, float]]) -> List[Dict]:
+        """Score a batch of (lat, lng, radius) points in one RPC.
+
+        Builds a FeatureCollection of buffered points and runs a single
+        reduceRegions over a stacked flood/elevation/built-up image, so
+        N locations cost one round-trip instead of N separate
+        reduceRegion + getInfo chains. Risk levels for the whole batch
+        come from the vectorized analyze_grid kernel.
+        """
         if not self.initialized:
-            logger.error("Earth Engine not initialized for building analysis")
+            logger.error("Earth Engine not initialized for point batch analysis")
             raise Exception("Earth Engine not initialized")
-        
-        logger.info(f"Starting building analysis: lat={lat}, lng={lng}, radius={radius}")
-        
+        if not points:
+            return []
+
+        logger.info("Starting batched analysis of %d points", len(points))
+
         try:
-            point = ee.Geometry.Point([lng, lat])
-            region = point.buffer(radius)
-            
-            logger.info("Fetching Sentinel-2 data for building detection...")
-            # Use Sentinel-2 for building detection (simplified)
-            sentinel2 = ee.ImageCollection('COPERNICUS/S2_SR') \
-                .filterBounds(region) \
-                .filterDate('2023-01-01', '2024-12-31') \
-                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-            
-            sentinel2_count = sentinel2.size().getInfo()
-            logger.info(f"Found {sentinel2_count} Sentinel-2 images")
-            
-            if sentinel2_count > 0:
-                logger.info("Processing Sentinel-2 composite for building detection...")
-                # Get median composite
-                composite = sentinel2.median()
-                
-                # Calculate NDBI (Normalized Difference Built-up Index)
-                nir = composite.select('B8')
-                swir = composite.select('B11')
-                ndbi = swir.subtract(nir).divide(swir.add(nir))
-                
-                # Built-up area threshold
-                built_up = ndbi.gt(0.1)
-                
-                logger.info("Calculating built-up area statistics...")
-                # Calculate built-up percentage
-                built_up_stats = built_up.reduceRegion(
-                    reducer=ee.Reducer.mean(),
-                    geometry=region,
-                    scale=10,
-                    maxPixels=1e9
-                )
-                
-                built_up_percentage = built_up_stats.getInfo().get('B11', 0) * 100
-                logger.info(f"Built-up area percentage: {built_up_percentage:.2f}%")
-                
-                # Estimate building count (rough approximation)
-                estimated_buildings = int(built_up_percentage * radius / 100)
-                logger.info(f"Estimated total buildings: {estimated_buildings}")
-                
-                # Simulate damage assessment based on flood risk
-                logger.info("Assessing potential damage based on flood risk...")
-                flood_data = self.get_flood_analysis(lat, lng, radius)
-                damage_factor = {
-                    "High": 0.35,
-                    "Medium": 0.15,
-                    "Low": 0.05
-                }.get(flood_data['risk_level'], 0.05)
-                
-                damaged_buildings = int(estimated_buildings * damage_factor)
-                logger.info(f"Estimated damaged buildings: {damaged_buildings} (factor: {damage_factor})")
-                
-            else:
-                built_up_percentage = 0
-                estimated_buildings = 0
-                damaged_buildings = 0
-                logger.warning("No Sentinel-2 images found for building analysis")
-            
-            result = {
-                'total_buildings': estimated_buildings,
-                'damaged_buildings': damaged_buildings,
-                'built_up_percentage': round(built_up_percentage, 2),
-                'damage_percentage': round((damaged_buildings / max(estimated_buildings, 1)) * 100, 2),
-                'coordinates': {'lat': lat, 'lng': lng}
-            }
-            
-            logger.info(f"Building analysis completed successfully")
-            return result
-            
+            features = []
+            for lat, lng, radius in points:
+                lat_q, lng_q, radius_q = _quantize(lat, lng, radius)
+                features.append(ee.Feature(
+                    _region(lat_q, lng_q, radius_q),
+                    {'lat': lat_q, 'lng': lng_q, 'radius': radius_q}
+                ))
+            fc = ee.FeatureCollection(features)
+
+            vv = ee.ImageCollection(_S1_GRD_ID) \
+                .filterBounds(fc) \
+                .filterDate(_DATE_START, _DATE_END) \
+                .filter(ee.Filter.eq('instrumentMode', 'IW')) \
+                .select('VV') \
+                .sort('system:time_start', False).mosaic()
+            ndbi_source = ee.ImageCollection(_S2_SR_ID) \
+                .filterBounds(fc) \
+                .filterDate(_DATE_START, _DATE_END) \
+                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20)) \
+                .median()
+            ndbi = ndbi_source.select('B11').subtract(ndbi_source.select('B8')) \
+                .divide(ndbi_source.select('B11').add(ndbi_source.select('B8')))
+
+            # uint8 masks: the boolean bands aggregate as single bytes
+            # instead of 64-bit floats, shrinking EE's working set.
+            stacked = vv.lt(-15).uint8().rename('flood') \
+                .addBands(_srtm().rename('elevation')) \
+                .addBands(ndbi.gt(0.1).uint8().rename('built_up'))
+
+            reduced = stacked.reduceRegions(
+                collection=fc,
+                reducer=ee.Reducer.mean(),
+                scale=10
+            ).getInfo()
+
+            results = []
+            flood_pcts, elevations = [], []
+            for feature in reduced['features']:
+                props = feature['properties']
+                flood_pct = (props.get('flood') or 0) * 100
+                elevation = props.get('elevation') or 0
+                flood_pcts.append(flood_pct)
+                elevations.append(elevation)
+                results.append({
+                    'flood_percentage': round(flood_pct, 2),
+                    'average_elevation': round(elevation, 2),
+                    'built_up_percentage': round((props.get('built_up') or 0) * 100, 2),
+                    'coordinates': {'lat': props['lat'], 'lng': props['lng']},
+                    'coordinates_snapped': True,
+                    'analysis_radius': props['radius']
+                })
+            for result, risk in zip(results, self.analyze_grid(flood_pcts, elevations)):
+                result['risk_level'] = risk
+
+            logger.info("Batched analysis completed for %d points", len(results))
+            return results
+
         except Exception as e:
-            logger.error(f"Error in building analysis: {e}")
-            raise Exception(f"Error in building analysis: {e}")
-    
+            logger.error("Error in batched point analysis: %s", e)
+            raise Exception(f"Error in batched point analysis: {e}")
+
+    def analyze_grid(self, flood_percentages, elevations) -> List[str]:
+        """Score many points at once from precomputed statistics.
+
+        Takes parallel sequences of flood percentage and mean elevation
+        (e.g. from a bulk reduceRegions export) and applies the same
+        risk ladder as get_combined_analysis in one vectorized pass
+        instead of a Python branch per point. JIT-compiled via numba
+        when it is installed.
+        """
+        codes = _score_risk_codes(
+            np.asarray(flood_percentages, dtype=np.float64),
+            np.asarray(elevations, dtype=np.float64),
+        )
+        return [_RISK_LEVELS[code] for code in codes]
+
     def get_satellite_layers(self, lat: float, lng: float, zoom: int = 10) -> Dict:
         """Get different satellite layers for visualization"""
         if not self.initialized:
             logger.error("Earth Engine not initialized for satellite layers")
             raise Exception("Earth Engine not initialized")
         
-        logger.info(f"Getting satellite layers: lat={lat}, lng={lng}, zoom={zoom}")
-        
+        logger.info("Getting satellite layers: lat=%s, lng=%s, zoom=%s", lat, lng, zoom)
+
         try:
-            point = ee.Geometry.Point([lng, lat])
-            region = point.buffer(10000)  # 10km buffer
-            
-            layers = {}
-            
-            logger.info("Generating Sentinel-2 True Color layer...")
-            # Sentinel-2 True Color
-            sentinel2 = ee.ImageCollection('COPERNICUS/S2_SR') \
-                .filterBounds(region) \
-                .filterDate('2023-01-01', '2024-12-31') \
-                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20)) \
-                .median()
-            
-            vis_params_rgb = {
-                'bands': ['B4', 'B3', 'B2'],
-                'min': 0,
-                'max': 3000,
-                'gamma': 1.4
-            }
-            
-            layers['satellite'] = self.get_map_id(sentinel2, vis_params_rgb)
-            logger.info("Sentinel-2 True Color layer generated")
-            
-            logger.info("Generating NDVI vegetation layer...")
+            # Sentinel-2 True Color (same composite building analysis uses)
+            sentinel2 = _sentinel2_composite(*_quantize(lat, lng, 10000))
+
             # NDVI for vegetation
             ndvi = sentinel2.normalizedDifference(['B8', 'B4'])
-            vis_params_ndvi = {
-                'min': -1,
-                'max': 1,
-                'palette': ['blue', 'white', 'green']
-            }
-            
-            layers['vegetation'] = self.get_map_id(ndvi, vis_params_ndvi)
-            logger.info("NDVI vegetation layer generated")
-            
-            logger.info("Generating elevation layer...")
-            # Elevation
-            elevation = ee.Image('USGS/SRTMGL1_003')
-            vis_params_elevation = {
-                'min': 0,
-                'max': 1000,
-                'palette': ['blue', 'green', 'yellow', 'red']
-            }
-            
-            layers['elevation'] = self.get_map_id(elevation, vis_params_elevation)
-            logger.info("Elevation layer generated")
-            
-            logger.info(f"All satellite layers generated successfully: {list(layers.keys())}")
+
+            # The three getMapId REST calls are independent and
+            # network-bound; overlapping them makes the endpoint cost
+            # one round-trip instead of three.
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                futures = {
+                    'satellite': executor.submit(self.get_map_id, sentinel2, _VIS_RGB),
+                    'vegetation': executor.submit(self.get_map_id, ndvi, _VIS_NDVI),
+                    'elevation': executor.submit(self.get_map_id, _srtm(), _VIS_ELEVATION),
+                }
+                layers = {name: future.result() for name, future in futures.items()}
+
+            logger.info("All satellite layers generated: %s", list(layers.keys()))
             return layers
             
         except Exception as e:
-            logger.error(f"Error getting satellite layers: {e}")
+            logger.error("Error getting satellite layers: %s", e)
             raise Exception(f"Error getting satellite layers: {e}")
 
-# Global instance
-earth_engine_service = EarthEngineService()
+@functools.lru_cache(maxsize=1)
+def get_earth_engine_service() -> EarthEngineService:
+    """Process-wide EarthEngineService, built on first use.
+
+    EE initialization signs a service-account JWT and fetches a token;
+    deferring it keeps that cost off the import path of workers (and
+    tests) that never touch Earth Engine.
+    """
+    return EarthEngineService()
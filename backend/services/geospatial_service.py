@@ -1,19 +1,27 @@
 import logging
 from datetime import datetime
 from typing import Dict, List, Optional, Any
-from services.earth_engine_service import earth_engine_service
-from services.ai_service import ai_service
+from services.earth_engine_service import get_earth_engine_service
+from services.ai_service import get_ai_service
 
 logger = logging.getLogger(__name__)
 
 class GeospatialService:
-    def __init__(self):
-        self.ee_service = earth_engine_service
-        self.ai_service = ai_service
-    
+    # Lazy accessors so importing this module (and constructing the
+    # global below) does not trigger EE/Groq initialization; the
+    # underlying services are memoized per process.
+
+    @property
+    def ee_service(self):
+        return get_earth_engine_service()
+
+    @property
+    def ai_service(self):
+        return get_ai_service()
+
     def process_location_query(self, lat: float, lng: float, query: Optional[str] = None) -> Dict[str, Any]:
         """Process a comprehensive location-based query"""
-        logger.info(f"Processing location query for coordinates: {lat}, {lng}")
+        logger.info("Processing location query for coordinates: %s, %s", lat, lng)
         
         try:
             # Start with basic location info
@@ -70,7 +78,7 @@ class GeospatialService:
             
             # Process natural language query if provided
             if query:
-                logger.info(f"Processing natural language query: {query}")
+                logger.info("Processing natural language query: %s", query)
                 try:
                     ai_analysis = self.ai_service.process_natural_query(query, result)
                     result['ai_analysis'] = ai_analysis
@@ -1,26 +1,87 @@
+import json
+import shelve
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 from geopy.geocoders import Nominatim
 
+# One shared client: geopy's requests-backed adapter keeps the TCP/TLS
+# connection alive, so repeated lookups skip the per-call handshake a
+# fresh Nominatim instance would pay.
+_GEOLOCATOR = Nominatim(user_agent="disaster_eye_test")
+
+# Hot-set of city coordinates bundled with the repo plus geocodes
+# persisted from earlier runs; a hit here is an O(1) dict lookup
+# instead of a several-hundred-millisecond Nominatim round-trip.
+_CITIES_PATH = Path(__file__).parent / "data" / "cities.json"
+_GEOCODE_DB = str(Path(__file__).parent / "data" / "geocode_cache")
+
+def _norm(name):
+    return unicodedata.normalize("NFKD", name).lower().strip()
+
+def _load_city_index():
+    index = {}
+    try:
+        with open(_CITIES_PATH) as f:
+            index = {_norm(name): tuple(coords) for name, coords in json.load(f).items()}
+    except (OSError, ValueError) as e:
+        print(f"City index unavailable: {e}")
+    # Warm with geocodes persisted by previous runs
+    try:
+        with shelve.open(_GEOCODE_DB) as db:
+            index.update(db)
+    except Exception:
+        pass
+    return index
+
+_CITY_INDEX = _load_city_index()
+
+def _remember(key, coords):
+    _CITY_INDEX[key] = coords
+    try:
+        with shelve.open(_GEOCODE_DB) as db:
+            db[key] = coords
+    except Exception:
+        pass
+
 def test_geocoding(location_name):
     try:
-        # Initialize Nominatim API
-        geolocator = Nominatim(user_agent="disaster_eye_test")
-        
+        key = _norm(location_name)
+        if key in _CITY_INDEX:
+            lat, lng = _CITY_INDEX[key]
+            print(f"Location found (cached): {location_name}")
+            print(f"Latitude: {lat}, Longitude: {lng}")
+            return lat, lng
+
         print(f"Attempting to geocode: {location_name}")
-        
+
         # Get location
-        location = geolocator.geocode(location_name)
-        
+        location = _GEOLOCATOR.geocode(location_name)
+
         if location:
             print(f"Location found: {location.address}")
             print(f"Latitude: {location.latitude}, Longitude: {location.longitude}")
+            _remember(key, (location.latitude, location.longitude))
             return location.latitude, location.longitude
         else:
             print("Location not found")
             return None
-            
+
     except Exception as e:
         print(f"Error during geocoding: {str(e)}")
         return None
 
+def geocode_many(location_names, max_workers=4):
+    """Geocode a batch of names over the shared keep-alive connection.
+
+    Lookups overlap in a small thread pool, so a batch costs roughly its
+    slowest round-trip instead of the sum of them. Keep batches modest:
+    Nominatim's usage policy caps sustained traffic at ~1 request/second.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(test_geocoding, location_names))
+
 # Test with "Chennai"
-test_geocoding("Chennai")
\ No newline at end of file
+if __name__ == "__main__":
+    test_geocoding("Chennai")
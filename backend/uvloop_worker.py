@@ -0,0 +1,11 @@
+from uvicorn.workers import UvicornWorker
+
+
+class UvloopUvicornWorker(UvicornWorker):
+    """UvicornWorker pinned to uvloop + httptools.
+
+    Pinning (rather than relying on auto-detection) guarantees the
+    Cython/libuv event loop is actually in use for the I/O-heavy tile
+    proxy instead of silently falling back to the selector loop.
+    """
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}